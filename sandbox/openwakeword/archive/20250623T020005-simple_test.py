@@ -7,6 +7,16 @@ tfliteの代わりにonnxを使用
 import numpy as np
 import sounddevice as sd
 import time
+import os
+import sys
+
+# 共通処理は親ディレクトリのwakeword_runtime.pyを共有する
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from wakeword_runtime import compute_volume, make_bars, PRINT_INTERVAL
+
+# 音量/スコアバー
+BAR_WIDTH = 50
+BARS = make_bars(BAR_WIDTH)
 
 def test_audio_recording():
     """音声録音のテスト"""
@@ -36,18 +46,24 @@ def test_wake_word_stub():
     
     sample_rate = 16000
     frame_length = 1280  # 80ms
+    last_print = 0.0
     
-    def audio_callback(indata, frames, time, status):
+    def audio_callback(indata, frames, time_info, status):
+        nonlocal last_print
+        
         if status:
             print(f"エラー: {status}")
         
         # 音量レベルの計算
-        volume = np.sqrt(np.mean(indata**2))
+        volume = compute_volume(indata[:, 0])
         
         # 簡単な音量ベースの検出（実際のウェイクワード検出ではない）
         if volume > 0.01:  # 閾値
-            bar = '█' * int(volume * 50)
-            print(f"\r音量: [{bar:<20}] {volume:.3f}", end="", flush=True)
+            now = time.monotonic()
+            if now - last_print >= PRINT_INTERVAL:
+                last_print = now
+                bar = BARS[min(int(volume * BAR_WIDTH), BAR_WIDTH)]
+                print(f"\r音量: [{bar:<20}] {volume:.3f}", end="", flush=True)
             
             # 大きな音を検出
             if volume > 0.1:
@@ -6,6 +6,16 @@
 import sounddevice as sd
 import numpy as np
 import time
+import os
+import sys
+
+# 共通処理は親ディレクトリのwakeword_runtime.pyを共有する
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from wakeword_runtime import compute_volume, make_bars, PRINT_INTERVAL
+
+# 音量/スコアバー
+BAR_WIDTH = 50
+BARS = make_bars(BAR_WIDTH)
 
 def main():
     """音声モニタリング"""
@@ -20,16 +30,21 @@ def main():
     # 統計情報
     max_volume = 0
     detection_count = 0
+    last_print = 0.0
+    
+    # 検出シミュレーション用の乱数はまとめて生成しておく
+    rng = np.random.default_rng()
+    rng_pool = rng.random(1024)
+    rng_index = 0
     
     def audio_callback(indata, frames, time_info, status):
-        nonlocal max_volume, detection_count
+        nonlocal max_volume, detection_count, last_print, rng_index
         
         if status:
             print(f"エラー: {status}")
         
-        # float32 -> int16相当に変換して音量計算
-        audio_int16 = indata[:, 0] * 32767
-        volume = np.sqrt(np.mean(audio_int16**2)) / 32767
+        # 音量計算（RMS、int16スケールは比率なので不要）
+        volume = compute_volume(indata[:, 0])
         
         # 最大音量更新
         if volume > max_volume:
@@ -37,7 +52,7 @@ def main():
         
         # 音量バー表示
         bar_length = int(volume * 100)
-        bar = '█' * min(bar_length, 50)
+        bar = BARS[min(bar_length, BAR_WIDTH)]
         
         # 音量レベルに応じた表示
         if volume > 0.001:  # ノイズフロア以上
@@ -50,13 +65,22 @@ def main():
             elif volume > 0.05:
                 level_indicator = " 🟢 小音量"
             
-            print(f"\r[{bar:<50}] {volume:.3f} {level_indicator}", end="", flush=True)
+            now = time.monotonic()
+            if now - last_print >= PRINT_INTERVAL:
+                last_print = now
+                print(f"\r[{bar:<50}] {volume:.3f} {level_indicator}", end="", flush=True)
             
             # ウェイクワード検出のシミュレーション
-            if volume > 0.2 and np.random.random() > 0.9:  # ランダムに「検出」
-                print(f"\n🎯 ウェイクワード検出をシミュレート！ (実際はOpenWakeWordが必要)")
-                print(f"   検出回数: {detection_count}")
-                print("")
+            if volume > 0.2:
+                if rng_index >= len(rng_pool):
+                    rng.random(out=rng_pool)
+                    rng_index = 0
+                is_hit = rng_pool[rng_index] > 0.9  # ランダムに「検出」
+                rng_index += 1
+                if is_hit:
+                    print(f"\n🎯 ウェイクワード検出をシミュレート！ (実際はOpenWakeWordが必要)")
+                    print(f"   検出回数: {detection_count}")
+                    print("")
     
     try:
         print("\n開始します...\n")
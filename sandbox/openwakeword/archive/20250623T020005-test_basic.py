@@ -7,6 +7,12 @@ import openwakeword
 from openwakeword.model import Model
 import numpy as np
 import time
+import os
+import sys
+
+# 共通処理は親ディレクトリのwakeword_runtime.pyを共有する
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from wakeword_runtime import load_model, optimize_sessions
 
 def test_model_loading():
     """モデルのロードテスト"""
@@ -95,7 +101,7 @@ def test_continuous_inference():
     """連続推論のパフォーマンステスト"""
     print("\n=== 連続推論テスト ===\n")
     
-    model = Model(wakeword_models=["alexa"], inference_framework="onnx")
+    model, model_paths = load_model(["alexa"])
     
     # 1秒分のテスト（80ms × 12.5 = 1秒）
     num_frames = 13
@@ -129,6 +135,36 @@ def test_continuous_inference():
     # リアルタイム性のチェック
     print(f"\nリアルタイム処理: {'✓ 可能' if max_time < 80 else '✗ 不可'} (80ms以内)")
     
+    # 同じフレーム数をまとめて1回で推論（openwakewordは連結した音声を受け付け、
+    # 特徴量抽出を1回で行って各フレームのスコアの最大値を返す）
+    model.reset()
+    batch = np.random.randint(-32768, 32767, size=1280 * num_frames, dtype=np.int16)
+    
+    start_time = time.time()
+    model.predict(batch)
+    batch_time = (time.time() - start_time) * 1000
+    
+    print(f"\nまとめて推論: {batch_time:.2f}ms ({num_frames}フレーム, "
+          f"1フレームあたり {batch_time / num_frames:.2f}ms)")
+    
+    # ONNX Runtimeの設定を最適化して同じ条件で比較
+    # （1スレッド・逐次実行・ORT_ENABLE_ALL・利用可能なExecutionProvider）
+    # さらにint8動的量子化したモデルでも比較する
+    for label, quantize in [("最適化設定", False), ("最適化設定+int8", True)]:
+        providers = optimize_sessions(model, model_paths, quantize=quantize)
+        model.reset()
+        optimized_times = []
+        
+        for i in range(num_frames):
+            dummy_audio = np.random.randint(-32768, 32767, size=1280, dtype=np.int16)
+            
+            start_time = time.time()
+            model.predict(dummy_audio)
+            optimized_times.append((time.time() - start_time) * 1000)
+        
+        print(f"\n{label} ({providers[0]}): 平均 {np.mean(optimized_times):.2f}ms, "
+              f"最大 {np.max(optimized_times):.2f}ms")
+    
     return True
 
 def main():
@@ -6,28 +6,43 @@
 import argparse
 import sounddevice as sd
 import numpy as np
-from openwakeword.model import Model
+import os
 import time
 from collections import deque
 import sys
 
+# 共通処理は親ディレクトリのwakeword_runtime.pyを共有する
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from wakeword_runtime import load_model, make_bars, optimize_sessions, PRINT_INTERVAL
+
+# 音量/スコアバー
+BAR_WIDTH = 20
+BARS = make_bars(BAR_WIDTH)
+
 class WakeWordDetector:
-    def __init__(self, model_name="alexa", threshold=0.5, debug=False):
+    def __init__(self, model_name="alexa", threshold=0.5, debug=False, batch_frames=1,
+                 num_threads=1, quantize=False, energy_gate=2_000_000):
         """
         Args:
             model_name: 使用するウェイクワードモデル
             threshold: 検出閾値 (0-1)
             debug: デバッグ出力の有効/無効
+            batch_frames: 1回の推論にまとめるフレーム数（1で最小レイテンシ）
+            num_threads: ONNX Runtimeの演算スレッド数
+            quantize: int8量子化したモデルで推論する
+            energy_gate: 1フレームの二乗和（int16）がこれ未満なら推論しない（0で無効）
         """
         self.model_name = model_name
         self.threshold = threshold
+        self.batch_frames = batch_frames
         self.debug = debug
         
         # モデルのロード
         print(f"モデル '{model_name}' をロード中...")
         try:
-            self.model = Model(wakeword_models=[model_name], inference_framework="onnx")
-            print("✓ モデルのロードに成功しました")
+            self.model, model_paths = load_model([model_name])
+            providers = optimize_sessions(self.model, model_paths, num_threads, quantize)
+            print(f"✓ モデルのロードに成功しました ({providers[0]}, {num_threads}スレッド)")
         except Exception as e:
             print(f"✗ モデルのロードに失敗しました: {e}")
             sys.exit(1)
@@ -37,33 +52,100 @@ class WakeWordDetector:
         self.frame_length = 1280  # 80ms at 16kHz
         
         # バッファとステート
-        self.audio_buffer = np.array([], dtype=np.int16)
+        # 事前確保したリングバッファ（np.appendによる再確保を避ける）
+        # 書き込み/読み出し済みサンプル数をそれぞれ片側だけが更新する（SPSC）
+        self.ring = np.zeros(self.frame_length * 8, dtype=np.int16)
+        self.ring_written = 0
+        self.ring_read = 0
         self.detection_history = deque(maxlen=5)  # 過去5フレームの履歴
         self.last_detection_time = 0
         self.detection_cooldown = 2.0  # 検出後のクールダウン（秒）
+        self.last_print = 0.0
+        
+        # エネルギーゲート（音声を検出した後も一定フレームは推論を続ける）
+        self.energy_gate = energy_gate
+        self.gate_hangover_frames = 12  # 約1秒
+        self.hangover_left = 0
         
     def audio_callback(self, indata, frames, time, status):
         """音声入力コールバック"""
         if status:
             print(f"オーディオエラー: {status}")
         
-        # float32 -> int16 変換
-        audio_int16 = (indata[:, 0] * 32767).astype(np.int16)
+        # ストリームをint16で開いているので変換は不要
+        audio_int16 = indata[:, 0]
         
         # バッファに追加
-        self.audio_buffer = np.append(self.audio_buffer, audio_int16)
+        self.write_ring(audio_int16)
         
-        # フレーム単位で処理
-        while len(self.audio_buffer) >= self.frame_length:
-            # 1フレーム取り出し
-            frame = self.audio_buffer[:self.frame_length]
-            self.audio_buffer = self.audio_buffer[self.frame_length:]
-            
+        # batch_framesフレーム単位で処理
+        frames = self.read_frame(self.batch_frames)
+        while frames is not None:
             # 推論実行
-            self.process_frame(frame)
+            self.process_frame(frames)
+            frames = self.read_frame(self.batch_frames)
+    
+    def write_ring(self, audio):
+        """リングバッファに音声を書き込む（書き込み側のみが呼ぶ）"""
+        size = len(self.ring)
+        n = len(audio)
+        w = self.ring_written % size
+        end = w + n
+        if end <= size:
+            self.ring[w:end] = audio
+        else:
+            split = size - w
+            self.ring[w:] = audio[:split]
+            self.ring[:end - size] = audio[split:]
+        self.ring_written += n
+    
+    def read_frame(self, count=1):
+        """リングバッファからcountフレーム分を取り出す（読み出し側のみが呼ぶ）
+        
+        フレームが揃っていなければNone。折り返し位置をまたぐ場合のみ連結し、
+        それ以外はリングバッファのビューを返す
+        """
+        length = self.frame_length * count
+        available = self.ring_written - self.ring_read
+        if available < length:
+            return None
+        size = len(self.ring)
+        if available > size:
+            # 読み出しが追いつかず上書きされた分はフレーム単位で読み飛ばす
+            overrun = available - size
+            self.ring_read += -(-overrun // self.frame_length) * self.frame_length
+        r = self.ring_read % size
+        end = r + length
+        if end <= size:
+            frame = self.ring[r:end]
+        else:
+            frame = np.concatenate((self.ring[r:], self.ring[:end - size]))
+        self.ring_read += length
+        return frame
     
     def process_frame(self, frame):
-        """1フレームの処理"""
+        """フレームの処理
+        
+        複数フレームをまとめて渡すと、openwakewordは特徴量抽出を1回で行い
+        各フレームのスコアの最大値を返す
+        
+        無音のフレームは推論をスキップする。openwakewordの特徴量バッファには
+        そのフレームが入らないため、発話直後の1-2フレームはスコアが低めに出る
+        （hangoverの間は推論を続けるので、発話中の連続性は保たれる）
+        """
+        # エネルギーゲート（フレーム数に比例させた閾値と比較）
+        if self.energy_gate > 0:
+            x = frame.astype(np.float32)
+            num_frames = len(frame) // self.frame_length
+            gate = self.energy_gate * num_frames
+            if float(np.dot(x, x)) < gate:
+                if self.hangover_left <= 0:
+                    return
+                # hangoverはフレーム単位なので、まとめたフレーム数だけ減らす
+                self.hangover_left -= num_frames
+            else:
+                self.hangover_left = self.gate_hangover_frames
+        
         # 推論
         prediction = self.model.predict(frame)
         
@@ -72,7 +154,10 @@ class WakeWordDetector:
         
         # デバッグ出力
         if self.debug and score > 0.1:  # ノイズ除去のため0.1以上のみ表示
-            print(f"\rスコア: {score:.3f} {'█' * int(score * 20):<20}", end="", flush=True)
+            now = time.monotonic()
+            if now - self.last_print >= PRINT_INTERVAL:
+                self.last_print = now
+                print(f"\rスコア: {score:.3f} {BARS[min(int(score * BAR_WIDTH), BAR_WIDTH)]:<20}", end="", flush=True)
         
         # 閾値チェック
         if score > self.threshold:
@@ -104,11 +189,16 @@ class WakeWordDetector:
                 callback=self.audio_callback,
                 channels=1,
                 samplerate=self.sample_rate,
-                blocksize=self.frame_length // 2  # 低レイテンシのため半フレーム
+                dtype='int16',  # PortAudio側でint16に変換させる
+                # 推論は1フレーム単位なので、コールバックも1フレーム毎にする
+                # （半フレームにしてもスコアは早まらず、Python側の処理回数が増えるだけ。
+                #   最悪で1フレーム＝80msの遅延）
+                blocksize=self.frame_length
             ):
-                # 無限ループで待機
+                # 検出はコールバック側で行うので、Ctrl+Cまでは待つだけ
+                # （sleepはシグナルで中断されるので、長く眠っても終了は遅れない）
                 while True:
-                    time.sleep(0.1)
+                    time.sleep(3600)
                     
         except KeyboardInterrupt:
             print("\n\n検出を終了しました。")
@@ -145,6 +235,30 @@ def main():
         action="store_true",
         help="デバッグ出力を有効化"
     )
+    parser.add_argument(
+        "--batch", "-b",
+        type=int,
+        default=1,
+        choices=[1, 2, 3, 4],
+        help="1回の推論にまとめるフレーム数 (default: 1、増やすと最大80ms×(N-1)遅延)"
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=1,
+        help="ONNX Runtimeの演算スレッド数 (default: 1)"
+    )
+    parser.add_argument(
+        "--int8",
+        action="store_true",
+        help="int8量子化したモデルで推論する"
+    )
+    parser.add_argument(
+        "--energy-gate",
+        type=float,
+        default=2_000_000,
+        help="1フレームの二乗和がこれ未満なら推論をスキップ (default: 2000000、0で無効)"
+    )
     parser.add_argument(
         "--list-devices", "-l",
         action="store_true",
@@ -167,7 +281,11 @@ def main():
     detector = WakeWordDetector(
         model_name=args.model,
         threshold=args.threshold,
-        debug=args.debug
+        debug=args.debug,
+        batch_frames=args.batch,
+        num_threads=args.threads,
+        quantize=args.int8,
+        energy_gate=args.energy_gate
     )
     
     detector.run()
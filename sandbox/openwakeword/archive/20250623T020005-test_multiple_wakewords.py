@@ -7,9 +7,20 @@
 import sounddevice as sd
 import numpy as np
 from openwakeword.model import Model
+import os
+import sys
 import time
 from datetime import datetime
 import threading
+import queue
+
+# 共通処理は親ディレクトリのwakeword_runtime.pyを共有する
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from wakeword_runtime import make_bars, PRINT_INTERVAL_NS
+
+# 音量/スコアバー
+BAR_WIDTH = 10
+BARS = make_bars(BAR_WIDTH)
 
 class MultiWakeWordDetector:
     def __init__(self):
@@ -19,39 +30,60 @@ class MultiWakeWordDetector:
                 "threshold": 0.5,
                 "action": self.alexa_action,
                 "color": "\033[94m",  # 青
-                "last_detection": 0
+                "last_detection_ns": 0
             },
             "hey_jarvis": {
                 "threshold": 0.5,
                 "action": self.jarvis_action,
                 "color": "\033[93m",  # 黄
-                "last_detection": 0
+                "last_detection_ns": 0
             },
             "hey_mycroft": {
                 "threshold": 0.5,
                 "action": self.mycroft_action,
                 "color": "\033[92m",  # 緑
-                "last_detection": 0
+                "last_detection_ns": 0
             }
         }
         
         # モデルのロード
         print("複数のウェイクワードモデルをロード中...")
-        wake_words = list(self.wake_configs.keys())
+        wake_words = [sys.intern(word) for word in self.wake_configs]
         self.model = Model(wakeword_models=wake_words, inference_framework="onnx")
         print(f"✓ {len(wake_words)}個のモデルをロードしました: {wake_words}")
         
+        # フレーム毎の辞書参照を避けるため (名前, 設定, 閾値) を事前に束ねておく
+        self.wake_items = [(word, self.wake_configs[word], self.wake_configs[word]["threshold"])
+                           for word in wake_words]
+        
         # 音声パラメータ
         self.sample_rate = 16000
         self.frame_length = 1280
-        self.audio_buffer = np.array([], dtype=np.int16)
+        # int16変換用のスクラッチバッファ（ブロックサイズ＝1フレーム分）
+        self.scratch_f32 = np.empty(self.frame_length, dtype=np.float32)
+        
+        # 推論は別スレッドで行う（コールバックはフレームを渡すだけ）
+        # フレームは事前確保したプールに書き込み、キューではスロット番号だけを受け渡す
+        pool_size = 8
+        self.frame_pool = np.empty((pool_size, self.frame_length), dtype=np.int16)
+        self.free_slots = queue.Queue()
+        for slot in range(pool_size):
+            self.free_slots.put(slot)
+        self.frame_queue = queue.Queue(maxsize=pool_size)
+        # 推論が遅れた時はキューに溜まったフレームを連結して1回で推論する
+        self.max_batch_frames = 4
+        self.batch_buffer = np.empty(self.frame_length * self.max_batch_frames,
+                                     dtype=np.int16)
+        self.is_running = True
         
         # 検出のクールダウン（連続検出を防ぐ）
         self.cooldown_period = 2.0  # 秒
+        self.cooldown_ns = int(self.cooldown_period * 1e9)
         
         # 統計情報
         self.detection_counts = {word: 0 for word in wake_words}
         self.start_time = time.time()
+        self.last_print_ns = 0
         
     def alexa_action(self):
         """Alexa検出時のアクション"""
@@ -73,38 +105,78 @@ class MultiWakeWordDetector:
         if status:
             print(f"オーディオエラー: {status}")
         
-        # float32 -> int16 変換
-        audio_int16 = (indata[:, 0] * 32767).astype(np.int16)
-        self.audio_buffer = np.append(self.audio_buffer, audio_int16)
-        
-        # フレーム単位で処理
-        while len(self.audio_buffer) >= self.frame_length:
-            frame = self.audio_buffer[:self.frame_length]
-            self.audio_buffer = self.audio_buffer[self.frame_length:]
-            self.process_frame(frame)
+        # blocksize=frame_lengthなので1回のコールバックがちょうど1フレーム
+        # float32 -> int16 変換（int16へのキャストはプールへのコピー時に行う）
+        scratch_f32 = self.scratch_f32
+        np.multiply(indata[:, 0], 32767, out=scratch_f32)
+        np.rint(scratch_f32, out=scratch_f32)
+        self.enqueue_frame(scratch_f32)
+    
+    def enqueue_frame(self, frame):
+        """フレームをint16でプールにコピーして推論スレッドへ渡す（満杯時は最古を破棄）"""
+        try:
+            slot = self.free_slots.get_nowait()
+        except queue.Empty:
+            try:
+                slot = self.frame_queue.get_nowait()
+            except queue.Empty:
+                return  # 推論スレッドが処理中のため今回のフレームは破棄
+        np.copyto(self.frame_pool[slot], frame, casting='unsafe')
+        self.frame_queue.put_nowait(slot)
+    
+    def inference_loop(self):
+        """推論スレッド"""
+        while self.is_running:
+            try:
+                slot = self.frame_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            slots = [slot]
+            while len(slots) < self.max_batch_frames:
+                try:
+                    slots.append(self.frame_queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                if len(slots) == 1:
+                    self.process_frame(self.frame_pool[slot])
+                else:
+                    # openwakewordは複数フレーム入力時に各フレームの最大スコアを返す
+                    batch = self.batch_buffer[:len(slots) * self.frame_length]
+                    np.take(self.frame_pool, slots, axis=0,
+                            out=batch.reshape(len(slots), self.frame_length))
+                    self.process_frame(batch)
+            finally:
+                for slot in slots:
+                    self.free_slots.put(slot)
     
     def process_frame(self, frame):
         """1フレームの処理"""
         # 全ウェイクワードで推論
+        # 1つのModelに全モデルをまとめてロードしているため、メルスペクトログラム等の
+        # 特徴量抽出はpredict 1回につき1度だけ行われ、各ウェイクワードで共有される
+        # （ウェイクワード毎にModelを分けると特徴量抽出が重複するので注意）
         predictions = self.model.predict(frame)
         
-        current_time = time.time()
+        now_ns = time.monotonic_ns()
         
         # 各ウェイクワードのスコアをチェック
-        for wake_word, score in predictions.items():
-            config = self.wake_configs[wake_word]
+        for wake_word, config, threshold in self.wake_items:
+            score = predictions[wake_word]
             
             # スコア表示（デバッグ用）
             if score > 0.1:  # ノイズ除去
-                bar = '█' * int(score * 10)
-                print(f"\r{wake_word:<12}: [{bar:<10}] {score:.3f}", end="", flush=True)
+                if now_ns - self.last_print_ns >= PRINT_INTERVAL_NS:
+                    self.last_print_ns = now_ns
+                    bar = BARS[min(int(score * BAR_WIDTH), BAR_WIDTH)]
+                    print(f"\r{wake_word:<12}: [{bar:<10}] {score:.3f}", end="", flush=True)
             
             # 閾値を超えた場合
-            if score > config["threshold"]:
+            if score > threshold:
                 # クールダウンチェック
-                if current_time - config["last_detection"] > self.cooldown_period:
+                if now_ns - config["last_detection_ns"] > self.cooldown_ns:
                     self.on_detection(wake_word, score)
-                    config["last_detection"] = current_time
+                    config["last_detection_ns"] = now_ns
     
     def on_detection(self, wake_word, score):
         """ウェイクワード検出時の処理"""
@@ -148,17 +220,22 @@ class MultiWakeWordDetector:
         print("\n異なるウェイクワードを話してみてください！")
         print("(Ctrl+Cで終了)\n")
         
+        inference_thread = threading.Thread(target=self.inference_loop)
+        inference_thread.daemon = True
+        inference_thread.start()
+        
         try:
             with sd.InputStream(
                 callback=self.audio_callback,
                 channels=1,
                 samplerate=self.sample_rate,
-                blocksize=self.frame_length // 2
+                blocksize=self.frame_length
             ):
                 while True:
                     time.sleep(0.1)
                     
         except KeyboardInterrupt:
+            self.is_running = False
             print("\n\n=== 最終統計 ===")
             self.show_stats()
             print("\n検出を終了しました。")
@@ -3,10 +3,19 @@
 OpenWakeWordで利用可能なモデルを確認して実行
 """
 
-import numpy as np
 import sounddevice as sd
 from pathlib import Path
 import time
+import os
+import sys
+
+# 共通処理は親ディレクトリのwakeword_runtime.pyを共有する
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from wakeword_runtime import compute_volume, make_bars, PRINT_INTERVAL
+
+# 音量/スコアバー
+BAR_WIDTH = 50
+BARS = make_bars(BAR_WIDTH)
 
 def check_available_models():
     """利用可能なモデルを確認"""
@@ -74,20 +83,21 @@ def simulate_wake_word_detection():
     # バッファと状態
     audio_buffer = []
     last_detection_time = 0
+    last_print = 0.0
     cooldown = 2.0  # 検出後のクールダウン
     
     # 簡易的な音声特徴
     energy_history = []
     
     def audio_callback(indata, frames, time_info, status):
-        nonlocal last_detection_time
+        nonlocal last_detection_time, last_print
         
         if status:
             print(f"エラー: {status}")
         
         # 音声エネルギー計算
         audio = indata[:, 0]
-        energy = np.sqrt(np.mean(audio**2))
+        energy = compute_volume(audio)
         
         # エネルギー履歴を保存（最大10フレーム）
         energy_history.append(energy)
@@ -96,8 +106,11 @@ def simulate_wake_word_detection():
         
         # 音量表示
         if energy > 0.01:
-            bar = '█' * int(energy * 50)
-            print(f"\r[{bar:<30}] {energy:.3f}", end="", flush=True)
+            now = time.monotonic()
+            if now - last_print >= PRINT_INTERVAL:
+                last_print = now
+                bar = BARS[min(int(energy * BAR_WIDTH), BAR_WIDTH)]
+                print(f"\r[{bar:<30}] {energy:.3f}", end="", flush=True)
         
         # ウェイクワード検出のシミュレーション
         current_time = time.time()
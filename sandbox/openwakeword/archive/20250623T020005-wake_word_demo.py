@@ -6,8 +6,21 @@
 
 import sounddevice as sd
 import numpy as np
+import math
 import time
+import queue
+import threading
 from datetime import datetime
+import os
+import sys
+
+# 共通処理は親ディレクトリのwakeword_runtime.pyを共有する
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from wakeword_runtime import make_bars, PRINT_INTERVAL
+
+# 音量/スコアバー
+BAR_WIDTH = 50
+BARS = make_bars(BAR_WIDTH)
 
 print("=== ウェイクワード検出デモ ===")
 print("\n使い方:")
@@ -31,6 +44,10 @@ detection_count = 0
 last_detection = 0
 cooldown = 1.5  # 検出後のクールダウン（秒）
 
+# コールバック -> 表示スレッドへの受け渡し (音量, 検出番号（0は未検出）, 時刻)
+# 表示（文字列の組み立て・print）はオーディオスレッドの外で行う
+display_queue = queue.SimpleQueue()
+
 def process_audio(indata, frames, time_info, status):
     """音声処理コールバック"""
     global detection_count, last_detection
@@ -38,38 +55,57 @@ def process_audio(indata, frames, time_info, status):
     if status:
         print(f"音声エラー: {status}")
     
-    # 音量計算
+    # 音量計算（RMS、二乗の一時配列を作らずBLASの内積で計算）
     audio = indata[:, 0]
-    volume = np.sqrt(np.mean(audio**2))
-    
-    # 音量メーター表示
-    meter_length = int(volume * 200)  # スケール調整
-    meter = '█' * min(meter_length, 50)
-    
-    # 常に音量を表示
-    print(f"\r音量: [{meter:<50}] {volume:.3f}", end="", flush=True)
+    volume = math.sqrt(float(np.dot(audio, audio)) / audio.size)
     
     # ウェイクワード検出（音量ベース）
     current_time = time.time()
+    detected = 0
     if volume > threshold and (current_time - last_detection) > cooldown:
         detection_count += 1
         last_detection = current_time
+        detected = detection_count
+    
+    display_queue.put((volume, detected, current_time))
+
+def print_worker():
+    """表示スレッド: キューに溜まった分をまとめて取り出し、
+    検出メッセージは毎回、音量メーターは最新値のみを間引いて表示する"""
+    last_print = 0.0
+    while True:
+        item = display_queue.get()
+        while True:
+            volume, detected, timestamp = item
+            if detected:
+                # 検出メッセージ
+                print(f"\n\n{'='*60}")
+                print(f"🎯 ウェイクワード検出！ #{detected}")
+                print(f"時刻: {datetime.fromtimestamp(timestamp).strftime('%H:%M:%S')}")
+                print(f"音量: {volume:.3f}")
+                print(f"{'='*60}")
+                print("\n本来ここで:")
+                print("1. より詳細な音声認識（Whisper等）を開始")
+                print("2. コマンドを待機")
+                print("3. アクションを実行")
+                print(f"\n音量メーター表示を継続します...\n")
+            try:
+                item = display_queue.get_nowait()
+            except queue.Empty:
+                break
         
-        # 検出メッセージ
-        print(f"\n\n{'='*60}")
-        print(f"🎯 ウェイクワード検出！ #{detection_count}")
-        print(f"時刻: {datetime.now().strftime('%H:%M:%S')}")
-        print(f"音量: {volume:.3f}")
-        print(f"{'='*60}")
-        print("\n本来ここで:")
-        print("1. より詳細な音声認識（Whisper等）を開始")
-        print("2. コマンドを待機")
-        print("3. アクションを実行")
-        print(f"\n音量メーター表示を継続します...\n")
+        # 音量メーター表示（常時、更新は間引く）
+        now = time.monotonic()
+        if now - last_print >= PRINT_INTERVAL:
+            last_print = now
+            meter_length = int(volume * 200)  # スケール調整
+            meter = BARS[min(meter_length, BAR_WIDTH)]
+            print(f"\r音量: [{meter:<50}] {volume:.3f}", end="", flush=True)
 
 # メイン処理
 try:
     print(f"\n開始しました！マイクに向かって話してください...\n")
+    threading.Thread(target=print_worker, daemon=True).start()
     
     # オーディオストリーム開始
     with sd.InputStream(
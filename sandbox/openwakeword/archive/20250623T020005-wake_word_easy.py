@@ -5,9 +5,18 @@
 """
 
 import sounddevice as sd
-import numpy as np
 import time
 from datetime import datetime
+import os
+import sys
+
+# 共通処理は親ディレクトリのwakeword_runtime.pyを共有する
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from wakeword_runtime import compute_volume, make_bars, PRINT_INTERVAL
+
+# 音量/スコアバー
+BAR_WIDTH = 40
+BARS = make_bars(BAR_WIDTH)
 
 print("=== ウェイクワード検出デモ（簡単版） ===")
 print("\n🎤 マイクに向かって何か話してください！")
@@ -25,35 +34,39 @@ frame_length = 1280  # 80ms
 detection_count = 0
 last_detection = 0
 max_volume = 0
+last_print = 0.0
 
 def process_audio(indata, frames, time_info, status):
     """音声処理コールバック"""
-    global detection_count, last_detection, max_volume
+    global detection_count, last_detection, max_volume, last_print
     
     if status:
         print(f"音声エラー: {status}")
     
     # 音量計算
     audio = indata[:, 0]
-    volume = np.sqrt(np.mean(audio**2))
+    volume = compute_volume(audio)
     
     # 最大音量更新
     if volume > max_volume:
         max_volume = volume
     
-    # 音量メーター表示（常時）
-    meter_length = int(volume * 300)  # より大きくスケール
-    meter = '█' * min(meter_length, 40)
-    level = ""
-    
-    if volume >= 0.10:
-        level = "🔴"
-    elif volume >= 0.05:
-        level = "🟡"
-    elif volume >= 0.01:
-        level = "🟢"
-    
-    print(f"\r[{meter:<40}] {volume:.3f} {level}", end="", flush=True)
+    # 音量メーター表示（常時、更新頻度は間引く）
+    now = time.monotonic()
+    if now - last_print >= PRINT_INTERVAL:
+        last_print = now
+        meter_length = int(volume * 300)  # より大きくスケール
+        meter = BARS[min(meter_length, BAR_WIDTH)]
+        level = ""
+        
+        if volume >= 0.10:
+            level = "🔴"
+        elif volume >= 0.05:
+            level = "🟡"
+        elif volume >= 0.01:
+            level = "🟢"
+        
+        print(f"\r[{meter:<40}] {volume:.3f} {level}", end="", flush=True)
     
     # ウェイクワード検出（とても低い閾値）
     current_time = time.time()
@@ -8,116 +8,216 @@
 
 import sounddevice as sd
 import numpy as np
-from openwakeword.model import Model
+import struct
 import time
-from collections import deque
 import threading
-import queue
 from datetime import datetime
 import os
 
+from wakeword_runtime import load_model, make_bars, optimize_sessions, PRINT_INTERVAL
+
+# 音量/スコアバー
+BAR_WIDTH = 20
+BARS = make_bars(BAR_WIDTH)
+
+class IOBoundSession:
+    """IOBindingで入出力バッファを使い回すONNX Runtimeセッション
+    
+    openwakewordのmodel_prediction_functionと同じく、特徴量を受け取って
+    session.run()と同じ形（出力配列のリスト）で結果を返す。
+    """
+    
+    def __init__(self, session):
+        self.session = session
+        self.binding = session.io_binding()
+        self.input_name = session.get_inputs()[0].name
+        self.output_name = session.get_outputs()[0].name
+        # 出力の次元が記号（文字列やNone）のモデルは、最初の推論結果から決める
+        output_dim = session.get_outputs()[0].shape[-1]
+        self.output_dim = output_dim if isinstance(output_dim, int) else None
+        self.input_buffer = None
+        self.output_buffer = None
+    
+    def bind(self, x):
+        """入力形状に合わせてバッファを確保し直してバインドする"""
+        shape = x.shape
+        if self.output_dim is None:
+            result = self.session.run([self.output_name], {self.input_name: x})[0]
+            self.output_dim = result.shape[-1]
+        self.input_buffer = np.empty(shape, dtype=np.float32)
+        self.output_buffer = np.empty((shape[0], self.output_dim), dtype=np.float32)
+        self.binding.bind_input(self.input_name, 'cpu', 0, np.float32,
+                                self.input_buffer.shape,
+                                self.input_buffer.ctypes.data)
+        self.binding.bind_output(self.output_name, 'cpu', 0, np.float32,
+                                 self.output_buffer.shape,
+                                 self.output_buffer.ctypes.data)
+    
+    def __call__(self, x):
+        if self.input_buffer is None or self.input_buffer.shape != x.shape:
+            self.bind(x)
+        np.copyto(self.input_buffer, x)
+        self.session.run_with_iobinding(self.binding)
+        # openwakewordは結果を保持するので、バッファのコピーを返す
+        return [self.output_buffer.copy()]
+
 class ContinuousWakeWordDetector:
     def __init__(self, 
                  wake_word="alexa",
                  threshold=0.5,
                  pre_buffer_sec=1.0,
-                 post_buffer_sec=2.0):
+                 post_buffer_sec=2.0,
+                 quantize=False,
+                 silence_threshold=1e-5):
         """
         Args:
             wake_word: 検出するウェイクワード
             threshold: 検出閾値
             pre_buffer_sec: ウェイクワード検出前の音声バッファ（秒）
             post_buffer_sec: ウェイクワード検出後の音声録音時間（秒）
+            quantize: int8量子化したモデルで推論する
+            silence_threshold: これ未満の平均パワー（フルスケール比）のフレームは推論しない（0で無効）。
+                省略したフレームはopenwakewordの特徴量バッファにも入らないため、
+                無音明けの最初の1-2フレームは古い文脈でスコアが計算され、低めに出ることがある
         """
         self.wake_word = wake_word
         self.threshold = threshold
         self.pre_buffer_sec = pre_buffer_sec
         self.post_buffer_sec = post_buffer_sec
+        self.silence_threshold = silence_threshold
         
         # モデルのロード
         print(f"モデル '{wake_word}' をロード中...")
-        self.model = Model(wakeword_models=[wake_word], inference_framework="onnx")
+        self.model, model_paths = load_model([wake_word])
+        # 推論はIOBindingで事前確保した入出力バッファを使い回す
+        optimize_sessions(self.model, model_paths, quantize=quantize,
+                          providers=["CPUExecutionProvider"],
+                          make_predict=IOBoundSession)
         print("✓ モデルのロードに成功しました")
         
         # 音声パラメータ
         self.sample_rate = 16000
-        self.frame_length = 1280  # 80ms
-        self.block_size = 320     # 20ms (低レイテンシ)
+        self.frame_length = 1280  # 80ms（1ブロック = 1フレーム）
         
         # バッファ
         pre_buffer_samples = int(self.sample_rate * self.pre_buffer_sec)
-        self.pre_buffer = deque(maxlen=pre_buffer_samples)
-        self.audio_queue = queue.Queue()
+        # プリバッファ（int16のリングバッファ）
+        self.pre_buffer = np.zeros(pre_buffer_samples, dtype=np.int16)
+        self.pre_buffer_pos = 0      # 次の書き込み位置
+        self.pre_buffer_filled = 0   # 有効なサンプル数
         
         # 状態管理
-        self.is_listening = True
         self.is_recording_command = False
-        self.command_buffer = []
-        self.command_start_time = 0
+        # コマンドバッファ（プリバッファ＋録音時間分を事前確保、0.5秒の余裕付き）
+        command_samples = int(self.sample_rate * (self.post_buffer_sec + 0.5))
+        self.command_buffer = np.empty(pre_buffer_samples + command_samples,
+                                       dtype=np.int16)
+        self.command_length = 0
+        self.command_start_ns = 0
+        self.post_buffer_ns = int(self.post_buffer_sec * 1e9)
+        
+        # 無音ゲート（音声を検出した後も一定フレームは推論を続ける）
+        self.silence_energy = silence_threshold * 32767.0 ** 2 * self.frame_length
+        self.silence_hangover_frames = 12  # 約1秒
+        self.hangover_left = 0
         
         # 検出履歴
         self.detection_history = []
+        self.last_print = 0.0
         
-    def audio_callback(self, indata, frames, time, status):
-        """音声入力コールバック"""
+    def audio_callback(self, indata, frames, time_info, status):
+        """音声入力コールバック（1ブロック = 1フレーム分のint16）"""
         if status:
             print(f"オーディオエラー: {status}")
         
-        # float32 -> int16
-        audio_int16 = (indata[:, 0] * 32767).astype(np.int16)
+        # RawInputStreamのバッファをコピーせずにint16配列として参照
+        frame = np.frombuffer(indata, dtype=np.int16)
         
-        # キューに追加（処理は別スレッド）
-        self.audio_queue.put(audio_int16)
+        try:
+            self.process_frame(frame)
+        except Exception as e:
+            print(f"処理エラー: {e}")
     
-    def process_audio_stream(self):
-        """音声ストリーム処理（別スレッド）"""
-        frame_buffer = np.array([], dtype=np.int16)
+    def process_frame(self, frame):
+        """1フレームの処理"""
+        # プリバッファに追加（常時）
+        self.write_pre_buffer(frame)
         
-        while self.is_listening:
-            try:
-                # キューから音声データを取得
-                audio_chunk = self.audio_queue.get(timeout=0.1)
-                
-                # プリバッファに追加（常時）
-                self.pre_buffer.extend(audio_chunk)
-                
-                # コマンド録音中の場合
-                if self.is_recording_command:
-                    self.command_buffer.extend(audio_chunk)
-                    
-                    # 録音時間チェック
-                    elapsed = time.time() - self.command_start_time
-                    if elapsed >= self.post_buffer_sec:
-                        self.process_command()
-                        continue
-                
-                # フレームバッファに追加
-                frame_buffer = np.append(frame_buffer, audio_chunk)
-                
-                # フレーム単位で処理
-                while len(frame_buffer) >= self.frame_length:
-                    frame = frame_buffer[:self.frame_length]
-                    frame_buffer = frame_buffer[self.frame_length:]
-                    
-                    # ウェイクワード検出
-                    if not self.is_recording_command:
-                        self.detect_wake_word(frame)
-                        
-            except queue.Empty:
-                continue
-            except Exception as e:
-                print(f"処理エラー: {e}")
+        # コマンド録音中の場合
+        if self.is_recording_command:
+            self.append_command(frame)
+            
+            # 録音時間チェック
+            elapsed_ns = time.monotonic_ns() - self.command_start_ns
+            if elapsed_ns >= self.post_buffer_ns:
+                self.finish_command()
+            return
+        
+        # ウェイクワード検出
+        self.detect_wake_word(frame)
+    
+    def write_pre_buffer(self, audio_chunk):
+        """プリバッファ（リングバッファ）に音声を書き込む"""
+        size = len(self.pre_buffer)
+        if size == 0:
+            return
+        audio_chunk = audio_chunk[-size:]
+        n = len(audio_chunk)
+        w = self.pre_buffer_pos
+        end = w + n
+        if end <= size:
+            self.pre_buffer[w:end] = audio_chunk
+        else:
+            split = size - w
+            self.pre_buffer[w:] = audio_chunk[:split]
+            self.pre_buffer[:end - size] = audio_chunk[split:]
+        self.pre_buffer_pos = end % size
+        self.pre_buffer_filled = min(self.pre_buffer_filled + n, size)
+    
+    def pre_buffer_snapshot(self, out):
+        """プリバッファの内容を古い順にoutの先頭へコピーし、サンプル数を返す
+        
+        リングバッファの後半・前半をそれぞれ1回のスライス代入でコピーする
+        （一時配列は作らない）
+        """
+        w = self.pre_buffer_pos
+        if self.pre_buffer_filled < len(self.pre_buffer):
+            out[:w] = self.pre_buffer[:w]
+            return w
+        tail = len(self.pre_buffer) - w
+        out[:tail] = self.pre_buffer[w:]
+        out[tail:tail + w] = self.pre_buffer[:w]
+        return tail + w
     
     def detect_wake_word(self, frame):
-        """ウェイクワード検出"""
+        """ウェイクワード検出
+        
+        無音のフレームは推論をスキップする。openwakewordには分類だけを省く口がなく、
+        特徴量（メルスペクトログラム・埋め込み）の計算ごと省略するので、
+        発話直後の1-2フレームはスコアが低めに出る（hangoverの間は推論を続けるので、
+        発話中の連続性は保たれる）。検出漏れが気になる場合は--no-silence-gateで無効にする
+        """
+        # 無音ゲート：フレームのエネルギーが閾値未満なら推論をスキップ
+        if self.silence_threshold > 0:
+            x = frame.astype(np.float32)
+            if float(np.dot(x, x)) < self.silence_energy:
+                if self.hangover_left <= 0:
+                    return
+                self.hangover_left -= 1
+            else:
+                self.hangover_left = self.silence_hangover_frames
+        
         # 推論
         prediction = self.model.predict(frame)
         score = prediction.get(self.wake_word, 0)
         
         # スコア表示（デバッグ）
         if score > 0.1:
-            bar = '█' * int(score * 20)
-            print(f"\r[{bar:<20}] {score:.3f}", end="", flush=True)
+            now = time.monotonic()
+            if now - self.last_print >= PRINT_INTERVAL:
+                self.last_print = now
+                bar = BARS[min(int(score * BAR_WIDTH), BAR_WIDTH)]
+                print(f"\r[{bar:<20}] {score:.3f}", end="", flush=True)
         
         # 閾値チェック
         if score > self.threshold:
@@ -134,10 +234,10 @@ class ContinuousWakeWordDetector:
         
         # コマンド録音開始
         self.is_recording_command = True
-        self.command_start_time = time.time()
+        self.command_start_ns = time.monotonic_ns()
         
         # プリバッファの内容をコマンドバッファに追加
-        self.command_buffer = list(self.pre_buffer)
+        self.command_length = self.pre_buffer_snapshot(self.command_buffer)
         
         # 検出履歴に追加
         self.detection_history.append({
@@ -145,13 +245,32 @@ class ContinuousWakeWordDetector:
             'score': score
         })
     
-    def process_command(self):
-        """録音されたコマンドを処理"""
+    def append_command(self, audio_chunk):
+        """コマンドバッファに音声を追加（容量を超えた分は切り捨て）"""
+        start = self.command_length
+        end = min(start + len(audio_chunk), len(self.command_buffer))
+        self.command_buffer[start:end] = audio_chunk[:end - start]
+        self.command_length = end
+    
+    def finish_command(self):
+        """コマンド録音を終了し、処理を別スレッドに渡す
+        
+        音声認識や保存でオーディオコールバックを止めないよう、
+        録音データをコピーしてから処理スレッドを起動する
+        """
         self.is_recording_command = False
         
-        # 音声データを numpy 配列に変換
-        audio_data = np.array(self.command_buffer, dtype=np.int16)
+        # 録音済みの範囲をコピー（バッファは次回の録音で再利用）
+        audio_data = self.command_buffer[:self.command_length].copy()
+        self.command_length = 0
         
+        command_thread = threading.Thread(target=self.process_command,
+                                          args=(audio_data,))
+        command_thread.daemon = True
+        command_thread.start()
+    
+    def process_command(self, audio_data):
+        """録音されたコマンドを処理（別スレッド）"""
         print(f"\n✅ 録音完了！")
         print(f"録音時間: {len(audio_data) / self.sample_rate:.1f}秒")
         print(f"サンプル数: {len(audio_data)}")
@@ -164,9 +283,6 @@ class ContinuousWakeWordDetector:
         if os.environ.get('SAVE_AUDIO', '').lower() == 'true':
             self.save_audio(audio_data)
         
-        # バッファをクリア
-        self.command_buffer = []
-        
         print(f"\n{'='*50}")
         print("再びウェイクワードを待っています...\n")
     
@@ -175,12 +291,17 @@ class ContinuousWakeWordDetector:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"wake_command_{timestamp}.wav"
         
-        import wave
-        with wave.open(filename, 'wb') as wf:
-            wf.setnchannels(1)
-            wf.setsampwidth(2)  # 16bit
-            wf.setframerate(self.sample_rate)
-            wf.writeframes(audio_data.tobytes())
+        # 44バイトのWAVヘッダ（モノラル・16bit PCM）を書いた後、
+        # サンプルはbytesへのコピーを作らずにそのまま書き出す
+        data_size = len(audio_data) * 2
+        header = struct.pack(
+            '<4sI4s4sIHHIIHH4sI',
+            b'RIFF', 36 + data_size, b'WAVE',
+            b'fmt ', 16, 1, 1, self.sample_rate, self.sample_rate * 2, 2, 16,
+            b'data', data_size)
+        with open(filename, 'wb') as f:
+            f.write(header)
+            audio_data.astype('<i2', copy=False).tofile(f)
         
         print(f"📁 音声を保存しました: {filename}")
     
@@ -212,24 +333,19 @@ class ContinuousWakeWordDetector:
         print("\nウェイクワードを話してください... (Ctrl+Cで終了)")
         print("ヒント: 音声保存を有効にする場合は SAVE_AUDIO=true を設定\n")
         
-        # 処理スレッド開始
-        process_thread = threading.Thread(target=self.process_audio_stream)
-        process_thread.daemon = True
-        process_thread.start()
-        
         try:
-            # オーディオストリーム開始
-            with sd.InputStream(
+            # オーディオストリーム開始（int16で1フレームずつ受け取る）
+            with sd.RawInputStream(
                 callback=self.audio_callback,
                 channels=1,
                 samplerate=self.sample_rate,
-                blocksize=self.block_size
+                dtype='int16',
+                blocksize=self.frame_length
             ):
                 while True:
                     time.sleep(0.1)
                     
         except KeyboardInterrupt:
-            self.is_listening = False
             print("\n\n検出を終了します...")
             self.show_statistics()
             print("\n👋 お疲れ様でした！")
@@ -264,6 +380,22 @@ def main():
         default=3.0,
         help="ウェイクワード後の録音時間（秒）"
     )
+    parser.add_argument(
+        "--int8",
+        action="store_true",
+        help="int8量子化したモデルで推論する"
+    )
+    parser.add_argument(
+        "--silence-threshold", "-s",
+        type=float,
+        default=1e-5,
+        help="無音とみなす平均パワー（フルスケール比、0で無音ゲート無効）"
+    )
+    parser.add_argument(
+        "--no-silence-gate",
+        action="store_true",
+        help="無音フレームでも推論する（無音明けのスコアの低下を避ける）"
+    )
     
     args = parser.parse_args()
     
@@ -271,7 +403,9 @@ def main():
         wake_word=args.model,
         threshold=args.threshold,
         pre_buffer_sec=args.pre_buffer,
-        post_buffer_sec=args.post_buffer
+        post_buffer_sec=args.post_buffer,
+        quantize=args.int8,
+        silence_threshold=0 if args.no_silence_gate else args.silence_threshold
     )
     
     detector.run()
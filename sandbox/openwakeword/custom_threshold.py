@@ -6,25 +6,32 @@
 
 import sounddevice as sd
 import numpy as np
-from openwakeword.model import Model
+import os
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
-from collections import deque
 import time
+import threading
+
+from wakeword_runtime import count_above, load_model, optimize_sessions
 
 class ThresholdTuner:
-    def __init__(self, model_name="alexa", window_seconds=10):
+    def __init__(self, model_name="alexa", window_seconds=10, num_threads=1,
+                 quantize=False):
         """
         Args:
             model_name: テストするウェイクワードモデル
             window_seconds: グラフに表示する時間窓（秒）
+            num_threads: ONNX Runtimeの演算スレッド数
+            quantize: int8量子化したモデルで推論する
         """
         self.model_name = model_name
         self.window_seconds = window_seconds
         
         # モデルのロード
         print(f"モデル '{model_name}' をロード中...")
-        self.model = Model(wakeword_models=[model_name], inference_framework="onnx")
+        self.model, model_paths = load_model([model_name])
+        providers = optimize_sessions(self.model, model_paths, num_threads, quantize)
+        print(f"実行プロバイダ: {providers[0]} ({num_threads}スレッド)")
         
         # 音声パラメータ
         self.sample_rate = 16000
@@ -32,12 +39,23 @@ class ThresholdTuner:
         
         # データ保存
         self.max_points = int(window_seconds / 0.08)  # 80ms per frame
-        self.scores = deque(maxlen=self.max_points)
-        self.timestamps = deque(maxlen=self.max_points)
-        self.audio_buffer = np.array([], dtype=np.int16)
+        # スコアと時刻は事前確保したリングバッファに保存する
+        self.scores = np.zeros(self.max_points, dtype=np.float32)
+        self.timestamps = np.zeros(self.max_points, dtype=np.float64)
+        self.score_index = 0   # 次の書き込み位置
+        self.score_count = 0   # 有効なデータ数
+        # 事前確保したリングバッファ（np.appendによる再確保を避ける）
+        # 書き込み/読み出し済みサンプル数をそれぞれ片側だけが更新する（SPSC）
+        self.ring = np.zeros(self.frame_length * 8, dtype=np.int16)
+        self.ring_written = 0
+        self.ring_read = 0
+        # 1フレーム揃ったことを音声処理スレッドに通知する（ポーリングしない）
+        self.frame_ready = threading.Event()
         
         # 統計情報
-        self.detection_events = []  # (timestamp, score, threshold)
+        # 検出イベントのスコア（閾値ごとの検出数の集計に使う。満杯で倍に拡張）
+        self.event_scores = np.empty(1024, dtype=np.float32)
+        self.event_count = 0
         self.false_positives = 0
         self.true_positives = 0
         
@@ -54,94 +72,207 @@ class ThresholdTuner:
         if status:
             print(f"オーディオエラー: {status}")
         
-        # float32 -> int16
-        audio_int16 = (indata[:, 0] * 32767).astype(np.int16)
-        self.audio_buffer = np.append(self.audio_buffer, audio_int16)
+        # ストリームをint16で開いているので変換は不要
+        audio_int16 = indata[:, 0]
+        self.write_ring(audio_int16)
+        if self.ring_written - self.ring_read >= self.frame_length:
+            self.frame_ready.set()
+    
+    def write_ring(self, audio):
+        """リングバッファに音声を書き込む（書き込み側のみが呼ぶ）"""
+        size = len(self.ring)
+        n = len(audio)
+        w = self.ring_written % size
+        end = w + n
+        if end <= size:
+            self.ring[w:end] = audio
+        else:
+            split = size - w
+            self.ring[w:] = audio[:split]
+            self.ring[:end - size] = audio[split:]
+        self.ring_written += n
+    
+    def read_frame(self):
+        """リングバッファから1フレーム取り出す（読み出し側のみが呼ぶ）
+        
+        フレームが揃っていなければNone。折り返し位置をまたぐ場合のみ連結し、
+        それ以外はリングバッファのビューを返す
+        """
+        available = self.ring_written - self.ring_read
+        if available < self.frame_length:
+            return None
+        size = len(self.ring)
+        if available > size:
+            # 読み出しが追いつかず上書きされた分はフレーム単位で読み飛ばす
+            overrun = available - size
+            self.ring_read += -(-overrun // self.frame_length) * self.frame_length
+        r = self.ring_read % size
+        end = r + self.frame_length
+        if end <= size:
+            frame = self.ring[r:end]
+        else:
+            frame = np.concatenate((self.ring[r:], self.ring[:end - size]))
+        self.ring_read += self.frame_length
+        return frame
+    
+    @staticmethod
+    def raise_thread_priority():
+        """呼び出したスレッドをCPUコアに固定し、優先度を上げる（できる範囲で）
+        
+        グラフ描画（メインスレッド）やGCとの競合による推論の遅れを減らす。
+        Linuxではsched_setaffinity/sched_setschedulerがスレッド単位で効く。
+        SCHED_FIFOや負のnice値にはroot権限かCAP_SYS_NICEが必要で、
+        権限がなければ何もしない。macOS等ではos.niceのみ（プロセス全体に効く）
+        """
+        try:
+            # 最後のコアに固定（コア0は割り込みやGUIと競合しやすいため）
+            os.sched_setaffinity(0, {max(os.sched_getaffinity(0))})
+        except (AttributeError, OSError):
+            pass
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(20))
+            return
+        except (AttributeError, OSError):
+            pass
+        try:
+            os.nice(-5)
+        except (AttributeError, OSError):
+            pass
     
     def process_audio(self):
-        """音声処理ループ"""
+        """音声処理ループ
+        
+        フレームが揃うまではframe_readyで待機する。リングバッファの読み書き位置は
+        通知より先に更新されるため、clearした後に読み直せば取りこぼさない
+        """
+        self.raise_thread_priority()
         while True:
             # フレーム単位で処理
-            if len(self.audio_buffer) >= self.frame_length:
-                frame = self.audio_buffer[:self.frame_length]
-                self.audio_buffer = self.audio_buffer[self.frame_length:]
-                
-                # 推論
-                prediction = self.model.predict(frame)
-                score = prediction.get(self.model_name, 0)
-                
-                # データ保存
-                current_time = time.time()
-                self.scores.append(score)
-                self.timestamps.append(current_time)
-                
-                # 検出イベントの記録
-                if score > self.current_threshold:
-                    self.detection_events.append((current_time, score, self.current_threshold))
-                
-            time.sleep(0.01)  # CPU使用率を下げる
+            frame = self.read_frame()
+            if frame is None:
+                self.frame_ready.wait()
+                self.frame_ready.clear()
+                continue
+            
+            # 推論
+            prediction = self.model.predict(frame)
+            score = prediction.get(self.model_name, 0)
+            
+            # データ保存
+            current_time = time.time()
+            self.append_score(current_time, score)
+            
+            # 検出イベントの記録
+            if score > self.current_threshold:
+                self.append_event(score)
     
-    def update_plot(self, frame):
-        """グラフ更新"""
-        if len(self.scores) < 2:
-            return
-        
+    def append_event(self, score):
+        """検出イベントのスコアを追加（満杯なら倍の大きさに確保し直す）"""
+        n = self.event_count
+        if n == len(self.event_scores):
+            self.event_scores = np.resize(self.event_scores, n * 2)
+        self.event_scores[n] = score
+        self.event_count = n + 1
+    
+    def append_score(self, timestamp, score):
+        """スコアをリングバッファに追加"""
+        i = self.score_index
+        self.scores[i] = score
+        self.timestamps[i] = timestamp
+        self.score_index = (i + 1) % self.max_points
+        self.score_count = min(self.score_count + 1, self.max_points)
+    
+    def score_history(self):
+        """(時刻, スコア) を古い順に返す（一周するまではコピーなしのビュー）"""
+        if self.score_count < self.max_points:
+            n = self.score_count
+            return self.timestamps[:n], self.scores[:n]
+        i = self.score_index
+        return (np.concatenate((self.timestamps[i:], self.timestamps[:i])),
+                np.concatenate((self.scores[i:], self.scores[:i])))
+    
+    def setup_plot(self):
+        """グラフの静的な部分（軸・ラベル・閾値ライン）を一度だけ描画し、
+        毎回更新するアーティストをanimated=Trueで作成する（ブリッティング用）"""
         # スコアの時系列グラフ
-        self.ax1.clear()
         self.ax1.set_title('Detection Score Over Time')
         self.ax1.set_xlabel('Time (seconds ago)')
         self.ax1.set_ylabel('Score')
         self.ax1.set_ylim(0, 1)
+        self.ax1.set_xlim(self.window_seconds, 0)
         self.ax1.grid(True, alpha=0.3)
         
-        # 時間軸の計算
-        if self.timestamps:
-            current_time = time.time()
-            time_ago = [current_time - t for t in self.timestamps]
-            
-            # スコアのプロット
-            self.ax1.plot(time_ago, self.scores, 'b-', label='Score')
-            
-            # 閾値ラインの描画
-            for threshold in self.test_thresholds:
-                alpha = 1.0 if threshold == self.current_threshold else 0.3
-                self.ax1.axhline(y=threshold, color='r', linestyle='--', 
-                               alpha=alpha, label=f'Threshold {threshold}' if alpha == 1 else '')
-            
-            # 最新スコアの表示
-            if self.scores:
-                latest_score = self.scores[-1]
-                self.ax1.text(0.02, 0.95, f'Latest: {latest_score:.3f}', 
-                            transform=self.ax1.transAxes, fontsize=12,
-                            bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.8))
-        
+        self.score_line, = self.ax1.plot([], [], 'b-', label='Score', animated=True)
+        self.threshold_lines = [
+            self.ax1.axhline(y=threshold, color='r', linestyle='--', alpha=0.3,
+                             animated=True)
+            for threshold in self.test_thresholds
+        ]
+        self.latest_text = self.ax1.text(
+            0.02, 0.95, '', transform=self.ax1.transAxes, fontsize=12,
+            verticalalignment='top', animated=True,
+            bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.8))
         self.ax1.legend(loc='upper right')
-        self.ax1.set_xlim(self.window_seconds, 0)
         
-        # スコア分布のヒストグラム
-        self.ax2.clear()
+        # スコア分布のヒストグラム（ビンは0-1の50分割で固定、縦軸は割合）
         self.ax2.set_title('Score Distribution')
         self.ax2.set_xlabel('Score')
-        self.ax2.set_ylabel('Frequency')
+        self.ax2.set_ylabel('Frequency (ratio)')
+        self.ax2.set_xlim(0, 1)
+        self.ax2.set_ylim(0, 1)
+        self.hist_edges = np.linspace(0, 1, 51)
+        self.hist_bars = self.ax2.bar(
+            self.hist_edges[:-1], np.zeros(50), width=np.diff(self.hist_edges),
+            align='edge', alpha=0.7, color='blue', edgecolor='black', animated=True)
+        self.stats_text = self.ax2.text(
+            0.7, 0.7, '', transform=self.ax2.transAxes, fontsize=10,
+            animated=True, bbox=dict(boxstyle='round', facecolor='lightgray'))
+        for threshold in self.test_thresholds:
+            self.ax2.axvline(x=threshold, color='red', linestyle='--', alpha=0.5)
         
-        if len(self.scores) > 10:
-            scores_array = np.array(self.scores)
-            self.ax2.hist(scores_array, bins=50, alpha=0.7, color='blue', edgecolor='black')
-            
-            # 統計情報
-            mean_score = np.mean(scores_array)
-            std_score = np.std(scores_array)
-            max_score = np.max(scores_array)
+        plt.tight_layout()
+        
+        self.animated_artists = [self.score_line, self.latest_text,
+                                 *self.threshold_lines, *self.hist_bars,
+                                 self.stats_text]
+        return self.animated_artists
+    
+    def update_plot(self, frame):
+        """グラフ更新（変化するアーティストのデータだけを差し替える）"""
+        if self.score_count < 2:
+            return self.animated_artists
+        timestamps, scores = self.score_history()
+        
+        # スコアの時系列
+        time_ago = time.time() - timestamps
+        self.score_line.set_data(time_ago, scores)
+        
+        # 現在の閾値ラインを強調
+        for line, threshold in zip(self.threshold_lines, self.test_thresholds):
+            line.set_alpha(1.0 if threshold == self.current_threshold else 0.3)
+        
+        # 最新スコアの表示
+        self.latest_text.set_text(
+            f'Latest: {scores[-1]:.3f}\nThreshold: {self.current_threshold}')
+        
+        # スコア分布（順序は関係ないので、時系列に並べ替える前のリングバッファを直接使う）
+        if self.score_count > 10:
+            values = self.scores[:self.score_count]
+            counts, _ = np.histogram(values, bins=self.hist_edges)
+            ratios = counts / self.score_count
+            for bar, ratio in zip(self.hist_bars, ratios):
+                bar.set_height(ratio)
             
-            stats_text = f'Mean: {mean_score:.3f}\nStd: {std_score:.3f}\nMax: {max_score:.3f}'
-            self.ax2.text(0.7, 0.7, stats_text, transform=self.ax2.transAxes,
-                        fontsize=10, bbox=dict(boxstyle='round', facecolor='lightgray'))
+            # 統計情報（分散は二乗和から求め、走査回数を減らす）
+            mean_score = values.mean()
+            var_score = float(np.dot(values, values)) / self.score_count - mean_score ** 2
+            std_score = np.sqrt(max(var_score, 0.0))
+            max_score = values.max()
             
-            # 閾値ライン
-            for threshold in self.test_thresholds:
-                self.ax2.axvline(x=threshold, color='red', linestyle='--', alpha=0.5)
+            self.stats_text.set_text(
+                f'Mean: {mean_score:.3f}\nStd: {std_score:.3f}\nMax: {max_score:.3f}')
         
-        plt.tight_layout()
+        return self.animated_artists
     
     def on_key_press(self, event):
         """キーボードイベント処理"""
@@ -161,7 +292,7 @@ class ThresholdTuner:
             print(f"\n✗ False Positive! (Total: {self.false_positives})")
         elif event.key == 'r':
             # リセット
-            self.detection_events.clear()
+            self.event_count = 0
             self.false_positives = 0
             self.true_positives = 0
             print("\n統計をリセットしました")
@@ -176,8 +307,9 @@ class ThresholdTuner:
         print(f"{'='*50}")
         
         # 各閾値での検出数を計算
-        for threshold in self.test_thresholds:
-            detections = sum(1 for _, score, _ in self.detection_events if score > threshold)
+        thresholds = np.array(self.test_thresholds, dtype=np.float32)
+        counts = count_above(self.event_scores, thresholds, self.event_count)
+        for threshold, detections in zip(self.test_thresholds, counts):
             print(f"閾値 {threshold}: {detections} 回検出")
         
         print(f"\nマニュアルマーキング:")
@@ -189,9 +321,12 @@ class ThresholdTuner:
             print(f"Precision: {precision:.2%}")
         
         # スコア分析
-        if self.scores:
-            scores_array = np.array(self.scores)
-            percentiles = np.percentile(scores_array, [50, 90, 95, 99])
+        if self.score_count:
+            # np.percentileのソートを避け、np.partitionで必要な順位だけを確定する
+            # （補間はせず、各パーセンタイル以下の最大の値を使う）
+            values = self.scores[:self.score_count]
+            kth = ((self.score_count - 1) * np.array([0.50, 0.90, 0.95, 0.99])).astype(int)
+            percentiles = np.partition(values, kth)[kth]
             print(f"\nスコア分布:")
             print(f"50%: {percentiles[0]:.3f}")
             print(f"90%: {percentiles[1]:.3f}")
@@ -216,7 +351,6 @@ class ThresholdTuner:
         self.fig.canvas.mpl_connect('key_press_event', self.on_key_press)
         
         # 音声処理スレッド開始
-        import threading
         audio_thread = threading.Thread(target=self.process_audio)
         audio_thread.daemon = True
         audio_thread.start()
@@ -227,11 +361,18 @@ class ThresholdTuner:
                 callback=self.audio_callback,
                 channels=1,
                 samplerate=self.sample_rate,
-                blocksize=self.frame_length // 4
+                dtype='int16',  # PortAudio側でint16に変換させる
+                # 推論は1フレーム単位なので、コールバックも1フレーム毎にする
+                # （細かくしてもスコアは早まらず、Python側の処理回数が増えるだけ。
+                #   最悪で1フレーム＝80msの遅延）
+                blocksize=self.frame_length
             ):
                 # アニメーション開始
-                ani = FuncAnimation(self.fig, self.update_plot, 
-                                  interval=100, blit=False)
+                # 静的な部分は背景としてキャッシュされ、毎回は変化する部分だけ描画する
+                ani = FuncAnimation(self.fig, self.update_plot,
+                                  init_func=self.setup_plot,
+                                  interval=100, blit=True,
+                                  cache_frame_data=False)
                 plt.show()
                 
         except Exception as e:
@@ -259,6 +400,17 @@ def main():
         default=10,
         help="グラフの時間窓（秒）"
     )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=1,
+        help="ONNX Runtimeの演算スレッド数"
+    )
+    parser.add_argument(
+        "--int8",
+        action="store_true",
+        help="int8量子化したモデルで推論する"
+    )
     
     args = parser.parse_args()
     
@@ -268,7 +420,9 @@ def main():
     
     tuner = ThresholdTuner(
         model_name=args.model,
-        window_seconds=args.window
+        window_seconds=args.window,
+        num_threads=args.threads,
+        quantize=args.int8
     )
     
     tuner.run()
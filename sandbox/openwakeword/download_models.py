@@ -3,12 +3,55 @@
 OpenWakeWordのモデルをダウンロードするスクリプト
 """
 
+import argparse
 import os
 import requests
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
-def download_models():
-    """プリトレーニング済みモデルのダウンロード"""
+# ダウンロード時の書き込み単位（ファイル全体をメモリに載せない）
+CHUNK_SIZE = 1 << 20
+
+def download_file(session, url, dest):
+    """URLの内容を受信しながらファイルに書き込む
+    
+    途中で失敗しても壊れたファイルが残らないよう、一時ファイルに書いてから置き換える
+    """
+    tmp_path = dest.with_suffix(dest.suffix + ".part")
+    try:
+        with session.get(url, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            with open(tmp_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    f.write(chunk)
+        os.replace(tmp_path, dest)
+    except BaseException:
+        # 失敗・中断時は書きかけのファイルを残さない
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return dest
+
+def fetch_models(base_url, filenames, models_dir):
+    """複数のモデルを並列にダウンロード（1つのSessionで接続を使い回す）"""
+    with requests.Session() as session:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = {
+                filename: executor.submit(download_file, session, base_url + filename,
+                                          models_dir / filename)
+                for filename in filenames
+            }
+            for filename, future in futures.items():
+                try:
+                    future.result()
+                    print(f"  ✓ {filename}")
+                except (requests.RequestException, OSError) as e:
+                    print(f"  ✗ {filename}: {e}")
+
+def download_models(download=False):
+    """プリトレーニング済みモデルの確認とダウンロード
+
+    download=Trueの時だけ、足りないONNXモデルをパッケージのモデルディレクトリにダウンロードする
+    """
     import openwakeword
     
     # OpenWakeWordのパッケージディレクトリを取得
@@ -20,8 +63,12 @@ def download_models():
     # ディレクトリが存在しない場合は作成
     models_dir.mkdir(parents=True, exist_ok=True)
     
-    # GitHubからモデルをダウンロード
-    base_url = "https://github.com/dscripka/openWakeWord/raw/main/openwakeword/resources/models/"
+    # GitHubのリリースからモデルをダウンロード
+    # （モデルはリポジトリ内ではなくリリースのアセットとして配布されている）
+    base_url = "https://github.com/dscripka/openWakeWord/releases/download/v0.5.1/"
+    
+    # 全ウェイクワードモデルが共有する特徴量抽出モデル
+    feature_models = ["melspectrogram", "embedding_model"]
     
     models = {
         "alexa": "alexa_v0.1.tflite",
@@ -34,9 +81,24 @@ def download_models():
     for name, filename in models.items():
         print(f"  - {name} ({filename})")
     
+    # 各モデルと特徴量抽出モデルのONNX版のうち、足りないもの
+    onnx_filenames = [os.path.splitext(filename)[0] + ".onnx" for filename in models.values()]
+    onnx_filenames += [name + ".onnx" for name in feature_models]
+    missing = [filename for filename in onnx_filenames
+               if not (models_dir / filename).exists()]
+    if missing:
+        print("\n足りないONNXモデル:")
+        for filename in missing:
+            print(f"  - {base_url}{filename}")
+        if download:
+            print("\nONNXモデルをダウンロード中...")
+            fetch_models(base_url, missing, models_dir)
+        else:
+            print("ダウンロードするには --download を付けて実行してください")
+    
     print("\nONNXモデルの確認...")
     
-    # ONNXモデルの確認
+    # ONNXモデルの確認（ダウンロードした分も含める）
     onnx_models = list(models_dir.glob("*.onnx"))
     if onnx_models:
         print("見つかったONNXモデル:")
@@ -91,5 +153,9 @@ def test_simple_model():
         print(f"エラー: {e}")
 
 if __name__ == "__main__":
-    download_models()
+    parser = argparse.ArgumentParser(description="OpenWakeWordのモデルの確認とダウンロード")
+    parser.add_argument("--download", action="store_true",
+                        help="足りないONNXモデルをダウンロードする")
+    args = parser.parse_args()
+    download_models(download=args.download)
     test_simple_model()
\ No newline at end of file
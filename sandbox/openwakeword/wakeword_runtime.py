@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+OpenWakeWordテストスクリプトの共通部分
+モデルの読み込みとONNX Runtimeセッションの作り直し（int8量子化を含む）、
+音量計算・表示の間引きをここにまとめる
+
+openwakeword・onnxruntimeは読み込みが重く、音量表示だけのスクリプトでは使わないので、
+必要になった関数の中でインポートする
+"""
+
+import math
+import os
+import numpy as np
+
+# 音量/スコア表示の最小更新間隔。コールバック毎のflushを避ける
+PRINT_INTERVAL = 0.05  # 秒
+PRINT_INTERVAL_NS = 50_000_000  # ナノ秒（monotonic_nsで比較する場合）
+
+def make_bars(width):
+    """音量/スコアバーの文字列を幅0〜widthの分だけ事前生成する（コールバック毎の生成を避ける）
+
+    BARS[min(int(value * width), width)] のように添字で引く
+    """
+    return ['█' * i for i in range(width + 1)]
+
+try:
+    from numba import njit
+
+    @njit(cache=True, fastmath=True)
+    def compute_volume(audio):
+        """RMS音量（二乗和・平方根を1ループで計算）"""
+        s = 0.0
+        for v in audio:
+            s += v * v
+        return math.sqrt(s / len(audio))
+
+    @njit(cache=True)
+    def count_above(scores, thresholds, n):
+        """先頭n件のスコアのうち、各閾値を超えるものの件数"""
+        counts = np.zeros(len(thresholds), dtype=np.int64)
+        for i in range(n):
+            s = scores[i]
+            for j in range(len(thresholds)):
+                if s > thresholds[j]:
+                    counts[j] += 1
+        return counts
+
+    # 初回コールバックでのJITコンパイル待ちを避けるため、
+    # 呼び出し側と同じ形（indata[:, 0]など）でウォームアップしておく
+    compute_volume(np.zeros((1280, 1), dtype=np.float32)[:, 0])
+    count_above(np.zeros(1, dtype=np.float32), np.zeros(1, dtype=np.float32), 1)
+except ImportError:  # numba未インストール時はnumpyで計算
+    def compute_volume(audio):
+        """RMS音量"""
+        return math.sqrt(float(np.dot(audio, audio)) / len(audio))
+
+    def count_above(scores, thresholds, n):
+        """先頭n件のスコアのうち、各閾値を超えるものの件数
+        
+        1回ソートし、各閾値は二分探索で数える（閾値×件数の比較配列を作らない）
+        """
+        sorted_scores = np.sort(scores[:n])
+        return n - np.searchsorted(sorted_scores, thresholds, side='right')
+
+# 利用可能なら使うExecutionProvider（先頭ほど優先、CPUは常にフォールバック）
+PREFERRED_PROVIDERS = ["CoreMLExecutionProvider", "CUDAExecutionProvider",
+                       "CPUExecutionProvider"]
+
+def resolve_model_paths(wakeword_models):
+    """モデル名（"alexa"など）を学習済みONNXモデルのパスに解決する
+
+    openwakeword.Modelと同じく、既存のファイルはそのまま、名前はファイル名に
+    その名前を含む学習済みモデルを選ぶ
+    """
+    import openwakeword
+    pretrained_paths = openwakeword.get_pretrained_model_paths("onnx")
+    model_paths = []
+    for name in wakeword_models:
+        if os.path.exists(name):
+            model_paths.append(name)
+            continue
+        matches = [p for p in pretrained_paths
+                   if name.replace(" ", "_") in os.path.basename(p)]
+        if not matches:
+            raise ValueError(f"モデルが見つかりません: {name}")
+        model_paths.append(matches[0])
+    return model_paths
+
+def load_model(wakeword_models):
+    """ONNXでモデルを読み込み、各セッションの作成に使ったパスと一緒に返す
+
+    Returns:
+        (Model, {モデル名: ONNXファイルのパス})
+    """
+    from openwakeword.model import Model
+    # Modelは渡したリストを書き換えるのでコピーを渡す
+    model = Model(wakeword_models=list(wakeword_models), inference_framework="onnx")
+    # model.modelsはwakeword_modelsの順に作られる
+    model_paths = dict(zip(model.models, resolve_model_paths(wakeword_models)))
+    return model, model_paths
+
+def optimize_sessions(model, model_paths, num_threads=1, quantize=False,
+                      providers=None, make_predict=None):
+    """ウェイクワードモデルのONNX Runtimeセッションを最適化設定で作り直す
+
+    1フレーム（1280サンプル）の推論は計算量が小さく、スレッドの起床コストの方が
+    大きいため既定は1スレッド・逐次実行。グラフ最適化はORT_ENABLE_ALL。
+    quantize=Trueならint8動的量子化したモデル（*_int8.onnx）を使う
+
+    Args:
+        model_paths: load_modelが返した {モデル名: ONNXファイルのパス}
+        providers: 使うExecutionProvider（省略時はPREFERRED_PROVIDERSのうち利用可能なもの）
+        make_predict: セッションから推論関数を作る関数（省略時はsession.run）
+
+    Returns:
+        使用するExecutionProviderのリスト
+    """
+    import onnxruntime as ort
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.intra_op_num_threads = num_threads
+    options.inter_op_num_threads = 1
+    if providers is None:
+        available = ort.get_available_providers()
+        providers = [p for p in PREFERRED_PROVIDERS if p in available]
+
+    for name in list(model.models):
+        model_path = model_paths[name]
+        if quantize:
+            model_path = quantize_model(model_path)
+        session = ort.InferenceSession(model_path, sess_options=options,
+                                       providers=providers)
+        model.models[name] = session
+        if make_predict is not None:
+            model.model_prediction_function[name] = make_predict(session)
+        else:
+            input_name = session.get_inputs()[0].name
+            model.model_prediction_function[name] = (
+                lambda x, session=session, input_name=input_name:
+                    session.run(None, {input_name: x}))
+    return providers
+
+def quantize_model(model_path):
+    """int8動的量子化したモデルを作成（作成済みなら再利用）"""
+    quantized_path = os.path.splitext(model_path)[0] + "_int8.onnx"
+    if not os.path.exists(quantized_path):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        print(f"int8量子化モデルを作成中: {quantized_path}")
+        quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+    return quantized_path
@@ -3,13 +3,15 @@
 クイックテスト - 10秒間だけウェイクワード検出
 """
 
+import argparse
 import os
 import sys
-import time
-import pvporcupine
-import pvrecorder
 
-def quick_test():
+# 検出ループは親ディレクトリのwakeword_runtime.pyを共有する
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from wakeword_runtime import add_energy_gate_arguments, energy_gate_from_args, run_loop
+
+def quick_test(energy_gate=None):
     access_key = os.environ.get('PICOVOICE_ACCESS_KEY')
     if not access_key:
         print("エラー: PICOVOICE_ACCESS_KEY が設定されていません")
@@ -18,7 +20,10 @@ def quick_test():
     print("🎤 10秒間のウェイクワード検出テスト")
     print("話してください: 'picovoice' または 'computer'\n")
     
-    # 初期化
+    # 初期化（共有ライブラリの読み込みが重いので、APIキー確認後にインポートする）
+    import pvporcupine
+    import pvrecorder
+    
     porcupine = pvporcupine.create(
         access_key=access_key,
         keywords=['picovoice', 'computer']
@@ -30,23 +35,24 @@ def quick_test():
     )
     
     # 10秒間検出
-    recorder.start()
-    start_time = time.time()
     detected = False
     
+    def on_tick(elapsed_ns):
+        remaining = 10 - elapsed_ns // 1_000_000_000
+        print(f"\r残り {remaining} 秒...", end='', flush=True)
+    
+    def on_detect(keyword_index, now_ns):
+        nonlocal detected
+        word = ['picovoice', 'computer'][keyword_index]
+        print(f"\n\n✅ 検出成功！ '{word}' を認識しました！")
+        detected = True
+        return True  # 最初の検出で終了
+    
     try:
-        while time.time() - start_time < 10:
-            remaining = 10 - int(time.time() - start_time)
-            print(f"\r残り {remaining} 秒...", end='', flush=True)
-            
-            pcm = recorder.read()
-            keyword_index = porcupine.process(pcm)
-            
-            if keyword_index >= 0:
-                word = ['picovoice', 'computer'][keyword_index]
-                print(f"\n\n✅ 検出成功！ '{word}' を認識しました！")
-                detected = True
-                break
+        run_loop(porcupine, recorder, on_detect,
+                 duration_ns=10 * 1_000_000_000,
+                 energy_gate=energy_gate,
+                 on_tick=on_tick)
                 
     except Exception as e:
         print(f"\nエラー: {e}")
@@ -61,4 +67,6 @@ def quick_test():
     print("\nテスト完了")
 
 if __name__ == "__main__":
-    quick_test()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="10秒間のウェイクワード検出テスト")
+    add_energy_gate_arguments(parser)
+    quick_test(energy_gate_from_args(parser.parse_args()))
\ No newline at end of file
@@ -4,6 +4,7 @@ APIキーフォーマットの検証
 """
 
 import os
+import string
 from dotenv import load_dotenv
 
 # .envファイル読み込み
@@ -18,12 +19,9 @@ print(f"最初の10文字: {key[:10]}...")
 print(f"最後の10文字: ...{key[-10:]}")
 print()
 
-# 特殊文字チェック
-special_chars = []
-for char in key:
-    if not char.isalnum() and char not in ['-', '_', '.']:
-        if char not in special_chars:
-            special_chars.append(char)
+# 特殊文字チェック（許可する文字集合との差集合）
+allowed_chars = set(string.ascii_letters + string.digits + "-_.")
+special_chars = sorted(set(key) - allowed_chars)
 
 if special_chars:
     print(f"特殊文字が含まれています: {special_chars}")
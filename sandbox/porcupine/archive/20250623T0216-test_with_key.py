@@ -4,16 +4,21 @@ Picovoice PorcupineのAPIキーを使った動作テスト
 環境変数 PICOVOICE_ACCESS_KEY を設定して実行
 """
 
+import argparse
 import os
 import sys
 import time
-import numpy as np
 from dotenv import load_dotenv
 
+# 検出ループは親ディレクトリのwakeword_runtime.pyを共有する
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from wakeword_runtime import (add_energy_gate_arguments, cooldown_to_frames,
+                              energy_gate_from_args, run_loop)
+
 # .envファイル読み込み
 load_dotenv()
 
-def test_porcupine_with_key():
+def test_porcupine_with_key(energy_gate=None):
     """APIキーを使ったPorcupineテスト"""
     
     # APIキーの確認
@@ -70,34 +75,27 @@ def test_porcupine_with_key():
         print("話しかけてください... (Ctrl+Cで終了)")
         print(f"{'='*50}\n")
         
-        recorder.start()
-        
         # 検出ループ
         detection_count = 0
-        start_time = time.time()
+        start_ns = time.monotonic_ns()
+        
+        def on_detect(keyword_index, now_ns):
+            nonlocal detection_count
+            detection_count += 1
+            elapsed = (now_ns - start_ns) / 1e9
+            
+            print(f"\n{'🎯'*10}")
+            print(f"ウェイクワード検出！ #{detection_count}")
+            print(f"検出ワード: '{keywords[keyword_index]}'")
+            print(f"経過時間: {elapsed:.1f}秒")
+            print(f"{'🎯'*10}\n")
+            print("待機中...")
         
         try:
-            while True:
-                # 音声フレームを取得
-                pcm = recorder.read()
-                
-                # ウェイクワード検出
-                keyword_index = porcupine.process(pcm)
-                
-                if keyword_index >= 0:
-                    detection_count += 1
-                    current_time = time.time()
-                    elapsed = current_time - start_time
-                    
-                    print(f"\n{'🎯'*10}")
-                    print(f"ウェイクワード検出！ #{detection_count}")
-                    print(f"検出ワード: '{keywords[keyword_index]}'")
-                    print(f"経過時間: {elapsed:.1f}秒")
-                    print(f"{'🎯'*10}\n")
-                    print("待機中...")
-                    
-                    # クールダウン（連続検出を避ける）
-                    time.sleep(1)
+            # クールダウン（連続検出を避ける）は1秒分のフレームを読み流す
+            run_loop(porcupine, recorder, on_detect,
+                     cooldown_frames=cooldown_to_frames(porcupine, 1.0),
+                     energy_gate=energy_gate)
                     
         except KeyboardInterrupt:
             print("\n\n検出を終了します...")
@@ -108,7 +106,7 @@ def test_porcupine_with_key():
             porcupine.delete()
             
         # 統計表示
-        total_time = time.time() - start_time
+        total_time = (time.monotonic_ns() - start_ns) / 1e9
         print(f"\n=== 統計 ===")
         print(f"実行時間: {total_time:.1f}秒")
         print(f"検出回数: {detection_count}回")
@@ -152,11 +150,15 @@ def show_japanese_info():
 
 def main():
     """メイン処理"""
+    parser = argparse.ArgumentParser(description="Picovoice Porcupine 実動作テスト")
+    add_energy_gate_arguments(parser)
+    args = parser.parse_args()
+    
     print("Picovoice Porcupine 実動作テスト\n")
     print("(.envファイルからAPIキーを読み込みます)\n")
     
     # APIキーの確認と実行
-    if test_porcupine_with_key():
+    if test_porcupine_with_key(energy_gate_from_args(args)):
         print("\n✅ Porcupineは正常に動作しています！")
         print("✅ 完全ローカルで実行されています")
         print("✅ 音声データは外部に送信されません")
@@ -4,11 +4,44 @@ Porcupineの動作をシミュレーションするデモ
 APIキーなしで動作の雰囲気を体験できます
 """
 
+import os
+import sys
 import time
+import argparse
+import math
 import numpy as np
 import sounddevice as sd
+import queue
 from datetime import datetime
 
+# 音量メーター表示の最小更新間隔（秒）
+PRINT_INTERVAL = 0.1
+
+# 音量バー（幅ごとの文字列を事前生成し、コールバック毎の生成を避ける）
+BAR_WIDTH = 30
+BARS = ['█' * i for i in range(BAR_WIDTH + 1)]
+
+# 見出し・検出表示の飾り文字列
+RULE = '=' * 50
+TARGET_BAR = '🎯' * 20
+
+# 検出時の表示（メインスレッドで1回のwriteで出力する）
+DETECTION_MESSAGE = "\n".join([
+    f"\n{TARGET_BAR}",
+    "ウェイクワード検出！（シミュレーション）",
+    "検出ワード: '{keyword}'",
+    "時刻: {time}",
+    f"{TARGET_BAR}\n",
+    "実際のPorcupineでは、この検出が",
+    "ニューラルネットワークによって",
+    "非常に高精度に行われます\n",
+    "検出後の処理例:",
+    "1. Whisperで音声認識開始",
+    "2. コマンドを解析",
+    "3. アクション実行\n",
+    "待機中...\n\n",
+])
+
 class PorcupineSimulator:
     """Porcupineの動作をシミュレート"""
     
@@ -16,35 +49,63 @@ class PorcupineSimulator:
         self.keywords = keywords
         self.sample_rate = 16000
         self.frame_length = 512  # Porcupineの標準フレーム長
-        self.detection_history = []
+        # キーワードごとの検出回数（検出時に返すインデックスで加算する）
+        self.detection_counts = np.zeros(len(keywords), dtype=np.int32)
+        self.last_energy_sq = 0.0  # 直近フレームの平均パワー（int16単位の二乗）
+        # エネルギー計算用のfloat32作業バッファ（フレーム毎の配列確保を避ける）
+        self.scratch = np.empty(self.frame_length, dtype=np.float32)
+        # 検出シミュレーション用の乱数生成器（グローバルなRandomStateのロックを避ける）
+        self.rng = np.random.default_rng()
         
     def process_audio_frame(self, audio_frame):
         """音声フレームを処理（シミュレーション）"""
-        # 音量ベースの簡易検出
-        energy = np.sqrt(np.mean(audio_frame**2))
+        # 音量ベースの簡易検出（平均パワーを内積1回で求め、閾値の二乗と比較）
+        # int16のまま内積を取るとオーバーフローするためfloat32の作業バッファに写して計算する
+        if self.scratch.size < audio_frame.size:
+            self.scratch = np.empty(audio_frame.size, dtype=np.float32)
+        x = self.scratch[:audio_frame.size]
+        np.copyto(x, audio_frame)
+        energy_sq = float(np.dot(x, x)) / audio_frame.size
+        self.last_energy_sq = energy_sq
         
-        # ランダムな検出シミュレーション
-        if energy > 0.02 and np.random.random() > 0.95:
-            return np.random.randint(0, len(self.keywords))
+        # ランダムな検出シミュレーション（閾値はフルスケール比0.02）
+        if energy_sq > (0.02 * 32767) ** 2 and self.rng.random() > 0.95:
+            return int(self.rng.integers(len(self.keywords)))
         return -1
     
     def get_statistics(self):
         """統計情報を返す"""
-        if not self.detection_history:
+        total = int(self.detection_counts.sum())
+        if total == 0:
             return "検出なし"
         
-        total = len(self.detection_history)
-        keyword_counts = {}
-        for kw in self.detection_history:
-            keyword_counts[kw] = keyword_counts.get(kw, 0) + 1
-        
         stats = f"総検出数: {total}\n"
-        for kw, count in keyword_counts.items():
-            stats += f"  {kw}: {count}回\n"
+        for kw, count in zip(self.keywords, self.detection_counts.tolist()):
+            if count:
+                stats += f"  {kw}: {count}回\n"
         return stats
 
+def raise_thread_priority():
+    """呼び出したスレッド（オーディオコールバック）の優先度をリアルタイムに上げる
+    
+    LinuxのみSCHED_FIFOを設定する（root権限かCAP_SYS_NICEが必要）。
+    権限がない場合やmacOS/Windowsでは何もしない（PortAudio側の優先度のまま）
+    """
+    try:
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(20))
+    except (AttributeError, OSError):
+        pass
+
 def main():
     """メインデモ"""
+    parser = argparse.ArgumentParser(description="Porcupineの動作シミュレーション")
+    parser.add_argument(
+        "--realtime",
+        action="store_true",
+        help="低レイテンシ設定で開き、コールバックスレッドをリアルタイム優先度にする（Linux）"
+    )
+    args = parser.parse_args()
+    
     print("=== Picovoice Porcupine 動作シミュレーション ===\n")
     print("注: これは実際のPorcupineではなく、動作を模擬したデモです")
     print("実際のPorcupineは高精度なニューラルネットワークを使用します\n")
@@ -62,81 +123,91 @@ def main():
     print("  - 誤検出1回/10時間未満")
     print("  - レイテンシ<100ms")
     
-    print(f"\n{'='*50}")
+    print(f"\n{RULE}")
     print("マイクに向かって話してください (Ctrl+Cで終了)")
     print("大きめの声で話すと「検出」されやすくなります")
-    print(f"{'='*50}\n")
+    print(f"{RULE}\n")
     
     # 音声処理のコールバック
-    audio_buffer = []
-    last_detection_time = 0
-    detection_cooldown = 2.0
+    # ブロックサイズ＝フレーム長なので、受け取ったブロックをそのまま1フレームとして扱う
+    # 検出後のクールダウン（2秒）はフレーム数で数え、フレーム毎の時刻取得を避ける
+    cooldown_frames = max(1, int(2.0 * simulator.sample_rate / simulator.frame_length))
+    frames_since_detection = cooldown_frames  # 開始時はクールダウン済み
+    last_meter = 0.0
+    # コールバック内で毎回引く属性はローカル変数に束縛しておく
+    process_audio_frame = simulator.process_audio_frame
+    detection_counts = simulator.detection_counts
+    # コールバック -> メインスレッドへの検出通知 (検出ワード, 時刻)
+    detection_queue = queue.Queue()
+    
+    priority_pending = args.realtime
     
     def audio_callback(indata, frames, time_info, status):
-        nonlocal audio_buffer, last_detection_time
+        nonlocal frames_since_detection, last_meter, priority_pending
+        
+        # 初回のみ、コールバックを実行しているスレッドの優先度を上げる
+        if priority_pending:
+            priority_pending = False
+            raise_thread_priority()
         
         if status:
             print(f"Audio error: {status}")
         
-        # バッファに追加
-        audio_buffer.extend(indata[:, 0])
+        # 検出処理（シミュレーション、コピーしないビューをそのまま渡す）
+        keyword_index = process_audio_frame(indata[:, 0])
         
-        # フレーム単位で処理
-        while len(audio_buffer) >= simulator.frame_length:
-            # フレーム取り出し
-            frame = np.array(audio_buffer[:simulator.frame_length])
-            audio_buffer = audio_buffer[simulator.frame_length:]
-            
-            # 検出処理（シミュレーション）
-            keyword_index = simulator.process_audio_frame(frame)
+        frames_since_detection = min(frames_since_detection + 1, cooldown_frames)
+        if keyword_index >= 0 and frames_since_detection >= cooldown_frames:
+            detected_keyword = keywords[keyword_index]
+            detection_counts[keyword_index] += 1
+            frames_since_detection = 0
             
-            current_time = time.time()
-            if keyword_index >= 0 and (current_time - last_detection_time) > detection_cooldown:
-                detected_keyword = keywords[keyword_index]
-                simulator.detection_history.append(detected_keyword)
-                last_detection_time = current_time
-                
-                # 検出表示
-                print(f"\n{'🎯'*20}")
-                print(f"ウェイクワード検出！（シミュレーション）")
-                print(f"検出ワード: '{detected_keyword}'")
-                print(f"時刻: {datetime.now().strftime('%H:%M:%S')}")
-                print(f"{'🎯'*20}\n")
-                
-                print("実際のPorcupineでは、この検出が")
-                print("ニューラルネットワークによって")
-                print("非常に高精度に行われます\n")
-                
-                print("検出後の処理例:")
-                print("1. Whisperで音声認識開始")
-                print("2. コマンドを解析")
-                print("3. アクション実行\n")
-                
-                print("待機中...\n")
+            # 検出表示はメインスレッドに任せる（コールバック内で何行もprintしない）
+            detection_queue.put_nowait((detected_keyword, time.time()))
         
-        # 音量表示
-        volume = np.sqrt(np.mean(indata**2))
-        if volume > 0.01:
-            bar = '█' * int(volume * 100)
-            print(f"\r音量: [{bar:<30}] {volume:.3f}", end="", flush=True)
+        # 音量表示（検出処理で求めた平均パワーを使い回し、平方根は表示するときだけ計算）
+        volume_sq = simulator.last_energy_sq
+        if volume_sq > (0.01 * 32767) ** 2:
+            now = time.monotonic()
+            if now - last_meter >= PRINT_INTERVAL:
+                last_meter = now
+                volume = math.sqrt(volume_sq) / 32767
+                bar = BARS[min(int(volume * 100), BAR_WIDTH)]
+                print(f"\r音量: [{bar:<30}] {volume:.3f}", end="", flush=True)
     
     # オーディオストリーム開始
+    if args.realtime:
+        sd.default.latency = 'low'
     try:
         with sd.InputStream(
             callback=audio_callback,
             channels=1,
             samplerate=simulator.sample_rate,
-            blocksize=simulator.frame_length // 2
+            dtype='int16',  # Porcupineと同じint16 PCMで受け取る
+            blocksize=simulator.frame_length  # 1コールバック = Porcupineの1フレーム
         ):
             start_time = time.time()
+            next_report = 20
             
             while True:
-                time.sleep(1)
+                # 検出通知を待つ（最大1秒）。溜まっていればまとめて表示する
+                try:
+                    detection = detection_queue.get(timeout=1)
+                    while True:
+                        keyword, detected_at = detection
+                        sys.stdout.write(DETECTION_MESSAGE.format(
+                            keyword=keyword,
+                            time=datetime.fromtimestamp(detected_at).strftime('%H:%M:%S')))
+                        detection = detection_queue.get_nowait()
+                except queue.Empty:
+                    pass
+                sys.stdout.flush()
                 
-                # 定期的な情報表示
+                # 定期的な情報表示（20秒ごと）
                 elapsed = int(time.time() - start_time)
-                if elapsed > 0 and elapsed % 20 == 0:
-                    print(f"\n\n--- {elapsed}秒経過 ---")
+                if elapsed >= next_report:
+                    next_report = elapsed - elapsed % 20 + 20
+                    print(f"\n\n--- {elapsed - elapsed % 20}秒経過 ---")
                     print(simulator.get_statistics())
                     
     except KeyboardInterrupt:
@@ -7,58 +7,71 @@ CPU使用率、メモリ使用量を表示しながら動作
 import os
 import sys
 import time
-import threading
 import psutil
-import pvporcupine
-import pvrecorder
 from datetime import datetime
+from wakeword_runtime import (add_energy_gate_arguments, cooldown_to_frames,
+                              energy_gate_from_args, run_loop)
+
+# ステータス行の書式（毎秒のf-string組み立てを避け、formatメソッドを束縛しておく）
+STATUS_FORMAT = ("\r⏱️ 残り: {:02d}:{:02d} | "
+                 "プロセスCPU: {:5.1f}% | "
+                 "システムCPU: {:5.1f}% | "
+                 "メモリ: {:6.1f}MB | "
+                 "検出: {:d}回").format
+
+# 見出し・検出表示の飾り文字列（表示の度に生成せず使い回す）
+RULE = "=" * 70
+TARGET_BAR = "🎯" * 20
 
 class ResourceMonitor:
+    """CPU使用率・メモリ使用量の計測
+    
+    専用スレッドは持たず、検出ループから1秒ごとにsample()を呼んでもらう
+    """
     def __init__(self):
         self.process = psutil.Process()
-        self.running = False
         self.cpu_percent = 0
+        self.system_cpu = 0
         self.memory_mb = 0
         
     def start(self):
         """モニタリング開始"""
-        self.running = True
-        self.thread = threading.Thread(target=self._monitor_loop)
-        self.thread.daemon = True
-        self.thread.start()
-        
-    def stop(self):
-        """モニタリング停止"""
-        self.running = False
-        if hasattr(self, 'thread'):
-            self.thread.join()
+        # interval=Noneは前回呼び出しからの差分を返すので、ここで基準を取っておく
+        self.process.cpu_percent(interval=None)
+        psutil.cpu_percent(interval=None)
             
-    def _monitor_loop(self):
-        """モニタリングループ"""
-        while self.running:
-            try:
-                # CPU使用率（1秒間の平均）
-                self.cpu_percent = self.process.cpu_percent(interval=1)
-                # メモリ使用量（MB）
-                self.memory_mb = self.process.memory_info().rss / 1024 / 1024
-            except:
-                pass
+    def sample(self):
+        """前回のsample()（またはstart()）からのCPU使用率と現在のメモリ使用量を取得"""
+        try:
+            # CPU使用率（前回からの平均）
+            self.cpu_percent = self.process.cpu_percent(interval=None)
+            self.system_cpu = psutil.cpu_percent(interval=None)
+            # メモリ使用量（MB）
+            self.memory_mb = self.process.memory_info().rss / 1024 / 1024
+        except psutil.Error:
+            pass
 
 class WakeWordMonitor:
-    def __init__(self, duration_minutes=3):
+    def __init__(self, duration_minutes=3, energy_gate=None):
         self.access_key = os.environ.get('PICOVOICE_ACCESS_KEY')
         if not self.access_key:
             raise ValueError("PICOVOICE_ACCESS_KEY環境変数が設定されていません")
         
         self.duration = duration_minutes * 60  # 秒に変換
+        self.duration_ns = self.duration * 1_000_000_000
         self.porcupine = None
         self.recorder = None
         self.resource_monitor = ResourceMonitor()
         self.detection_count = 0
+        self.cooldown_frames = 1  # initialize()でフレーム長から計算
+        self.energy_gate = energy_gate  # EnergyGate（Noneなら全フレームで推論）
         
     def initialize(self):
         """初期化"""
         print("初期化中...")
+        # 共有ライブラリの読み込みが重いので、必要になってからインポートする
+        import pvporcupine
+        import pvrecorder
         
         # キーワード設定
         self.keywords = ['picovoice', 'computer', 'jarvis', 'alexa']
@@ -75,91 +88,77 @@ class WakeWordMonitor:
             device_index=-1
         )
         
+        # 連続検出防止のクールダウン（1秒）をフレーム数に換算
+        self.cooldown_frames = cooldown_to_frames(self.porcupine, 1.0)
+        
         print("✓ 初期化完了\n")
         
     def run(self):
         """メインループ"""
-        print("=" * 70)
+        print(RULE)
         print(f"🎤 リソースモニター付きウェイクワード検出 ({self.duration//60}分間)")
-        print("=" * 70)
+        print(RULE)
         print("検出対象:")
         for word in self.keywords:
             print(f"  • {word}")
         print("\n終了: Ctrl+C")
-        print("=" * 70)
+        print(RULE)
         
         # リソースモニター開始
         self.resource_monitor.start()
         
-        # 録音開始
-        self.recorder.start()
-        start_time = time.time()
-        last_update = 0
-        
+        # 録音開始（検出ループはwakeword_runtime.run_loopに任せる）
+        start_ns = time.monotonic_ns()
         try:
-            while True:
-                current_time = time.time()
-                elapsed = current_time - start_time
-                
-                # 終了条件
-                if elapsed >= self.duration:
-                    print(f"\n\n⏱️ {self.duration//60}分間のテスト完了")
-                    break
-                
-                # ステータス更新（1秒ごと）
-                if current_time - last_update >= 1:
-                    self._print_status(elapsed)
-                    last_update = current_time
-                
-                # ウェイクワード検出
-                pcm = self.recorder.read()
-                keyword_index = self.porcupine.process(pcm)
-                
-                if keyword_index >= 0:
-                    self.detection_count += 1
-                    detected_word = self.keywords[keyword_index]
-                    
-                    # 検出表示
-                    print(f"\n\n{'🎯' * 20}")
-                    print(f"検出 #{self.detection_count}: '{detected_word}' @ {datetime.now().strftime('%H:%M:%S')}")
-                    print(f"{'🎯' * 20}\n")
-                    
-                    # 連続検出防止
-                    time.sleep(1)
-                    
+            if run_loop(self.porcupine, self.recorder, self._on_detect,
+                        duration_ns=self.duration_ns,
+                        cooldown_frames=self.cooldown_frames,
+                        energy_gate=self.energy_gate,
+                        on_tick=self._on_tick):
+                print(f"\n\n⏱️ {self.duration//60}分間のテスト完了")
         except KeyboardInterrupt:
             print("\n\nユーザーによる中断")
         finally:
             self.cleanup()
-            self.show_summary(time.time() - start_time)
+            self.show_summary((time.monotonic_ns() - start_ns) / 1e9)
+            
+    def _on_tick(self, elapsed_ns):
+        """リソース計測とステータス更新（1秒ごと）"""
+        self.resource_monitor.sample()
+        self._print_status(elapsed_ns / 1e9)
+        
+    def _on_detect(self, keyword_index, now_ns):
+        """検出表示（1回のwriteでまとめて出力）"""
+        self.detection_count += 1
+        sys.stdout.write(
+            f"\n\n{TARGET_BAR}\n"
+            f"検出 #{self.detection_count}: '{self.keywords[keyword_index]}' @ {datetime.now().strftime('%H:%M:%S')}\n"
+            f"{TARGET_BAR}\n\n")
+        sys.stdout.flush()
             
     def _print_status(self, elapsed):
         """ステータス行の更新"""
-        remaining = self.duration - int(elapsed)
-        minutes = remaining // 60
-        seconds = remaining % 60
-        
-        process_cpu = self.resource_monitor.cpu_percent
-        system_cpu = psutil.cpu_percent(interval=0.1)
-        mem = self.resource_monitor.memory_mb
+        minutes, seconds = divmod(self.duration - int(elapsed), 60)
+        monitor = self.resource_monitor
         
-        status = (f"\r⏱️ 残り: {minutes:02d}:{seconds:02d} | "
-                 f"プロセスCPU: {process_cpu:5.1f}% | "
-                 f"システムCPU: {system_cpu:5.1f}% | "
-                 f"メモリ: {mem:6.1f}MB | "
-                 f"検出: {self.detection_count}回")
-        
-        print(status, end='', flush=True)
+        sys.stdout.write(STATUS_FORMAT(minutes, seconds, monitor.cpu_percent,
+                                       monitor.system_cpu, monitor.memory_mb,
+                                       self.detection_count))
+        sys.stdout.flush()
         
     def show_summary(self, total_time):
         """サマリー表示"""
-        print("\n" + "=" * 70)
+        print("\n" + RULE)
         print("📊 テストサマリー")
-        print("=" * 70)
+        print(RULE)
         print(f"実行時間: {total_time:.1f}秒")
         print(f"検出回数: {self.detection_count}回")
         if self.detection_count > 0:
             print(f"平均検出間隔: {total_time/self.detection_count:.1f}秒")
+        gate = self.energy_gate
+        if gate is not None and gate.frame_count > 0:
+            print(f"推論スキップ: {gate.skipped_count}/{gate.frame_count}フレーム "
+                  f"({gate.skipped_count / gate.frame_count:.0%})")
         
         print(f"\n最終リソース使用状況:")
         print(f"  プロセスCPU使用率: {self.resource_monitor.cpu_percent:.1f}%")
@@ -167,7 +166,7 @@ class WakeWordMonitor:
         
         # システム全体の情報
         print(f"\nシステム全体:")
-        print(f"  システムCPU使用率: {psutil.cpu_percent(interval=1):.1f}%")
+        print(f"  システムCPU使用率: {self.resource_monitor.system_cpu:.1f}%")
         print(f"  システムメモリ使用率: {psutil.virtual_memory().percent:.1f}%")
         
         print(f"\nPorcupineの効率性:")
@@ -178,8 +177,6 @@ class WakeWordMonitor:
         """クリーンアップ"""
         print("\nクリーンアップ中...")
         
-        self.resource_monitor.stop()
-        
         if self.recorder:
             self.recorder.stop()
             self.recorder.delete()
@@ -196,10 +193,12 @@ def main():
     parser = argparse.ArgumentParser(description='リソースモニター付きウェイクワード検出')
     parser.add_argument('--duration', type=int, default=3, 
                        help='テスト時間（分）デフォルト: 3分')
+    add_energy_gate_arguments(parser)
     args = parser.parse_args()
     
     try:
-        monitor = WakeWordMonitor(duration_minutes=args.duration)
+        monitor = WakeWordMonitor(duration_minutes=args.duration,
+                                  energy_gate=energy_gate_from_args(args))
         monitor.initialize()
         monitor.run()
     except Exception as e:
@@ -8,15 +8,15 @@ import os
 import sys
 import time
 import argparse
-import pvporcupine
-import pvrecorder
-from pathlib import Path
+from wakeword_runtime import (add_energy_gate_arguments, cooldown_to_frames,
+                              energy_gate_from_args, run_loop)
 
 class CustomWakeWordTester:
-    def __init__(self, ppn_path, wake_phrase, sensitivity=0.5):
+    def __init__(self, ppn_path, wake_phrase, sensitivity=0.5, energy_gate=None):
         self.ppn_path = ppn_path
         self.wake_phrase = wake_phrase
         self.sensitivity = sensitivity
+        self.energy_gate = energy_gate  # EnergyGate（Noneなら全フレームで推論）
         
         # APIキー確認
         self.access_key = os.environ.get('PICOVOICE_ACCESS_KEY')
@@ -24,7 +24,7 @@ class CustomWakeWordTester:
             raise ValueError("PICOVOICE_ACCESS_KEY環境変数が設定されていません")
         
         # ファイル存在確認
-        if not Path(ppn_path).exists():
+        if not os.path.isfile(ppn_path):
             raise FileNotFoundError(f"ウェイクワードファイルが見つかりません: {ppn_path}")
     
     def test(self, duration=60):
@@ -36,8 +36,10 @@ class CustomWakeWordTester:
         print(f"テスト時間: {duration}秒")
         print("=" * 60)
         
-        # Porcupine初期化
+        # Porcupine初期化（共有ライブラリの読み込みが重いので、ここでインポートする）
         print("\n初期化中...")
+        import pvporcupine
+        import pvrecorder
         porcupine = pvporcupine.create(
             access_key=self.access_key,
             keyword_paths=[self.ppn_path],
@@ -55,47 +57,35 @@ class CustomWakeWordTester:
         
         # 統計情報
         detection_count = 0
-        start_time = time.time()
-        last_detection = None
+        last_detection_ns = None
         
-        recorder.start()
+        def on_detect(keyword_index, now_ns):
+            nonlocal detection_count, last_detection_ns
+            detection_count += 1
+            
+            # 前回検出からの経過時間
+            if last_detection_ns is not None:
+                interval = (now_ns - last_detection_ns) / 1e9
+                interval_str = f" (前回から {interval:.1f}秒)"
+            else:
+                interval_str = ""
+            
+            print(f"\n✅ 検出 #{detection_count}: '{self.wake_phrase}' "
+                  f"@ {time.strftime('%H:%M:%S')}{interval_str}")
+            
+            last_detection_ns = now_ns
+            
+            # フィードバック
+            print("   └─ 良い発音です！")
         
+        start_ns = time.monotonic_ns()
         try:
-            while True:
-                current_time = time.time()
-                elapsed = current_time - start_time
-                
-                # 時間制限チェック
-                if duration > 0 and elapsed >= duration:
-                    print(f"\n\n時間制限 ({duration}秒) に達しました")
-                    break
-                
-                # 音声処理
-                pcm = recorder.read()
-                result = porcupine.process(pcm)
-                
-                if result >= 0:
-                    detection_count += 1
-                    detection_time = time.time()
-                    
-                    # 前回検出からの経過時間
-                    if last_detection:
-                        interval = detection_time - last_detection
-                        interval_str = f" (前回から {interval:.1f}秒)"
-                    else:
-                        interval_str = ""
-                    
-                    print(f"\n✅ 検出 #{detection_count}: '{self.wake_phrase}' "
-                          f"@ {time.strftime('%H:%M:%S')}{interval_str}")
-                    
-                    last_detection = detection_time
-                    
-                    # フィードバック
-                    print("   └─ 良い発音です！")
-                    
-                    # 連続検出防止
-                    time.sleep(1)
-                    
+            # 連続検出防止のクールダウンは1秒（読み込みは止めない）
+            if run_loop(porcupine, recorder, on_detect,
+                        duration_ns=duration * 1_000_000_000,
+                        cooldown_frames=cooldown_to_frames(porcupine, 1.0),
+                        energy_gate=self.energy_gate):
+                print(f"\n\n時間制限 ({duration}秒) に達しました")
         except KeyboardInterrupt:
             print("\n\nテスト中断")
         finally:
@@ -104,7 +94,7 @@ class CustomWakeWordTester:
             porcupine.delete()
             
         # 結果サマリー
-        total_time = time.time() - start_time
+        total_time = (time.monotonic_ns() - start_ns) / 1e9
         print("\n" + "=" * 60)
         print("📊 テスト結果")
         print("=" * 60)
@@ -150,6 +140,7 @@ def main():
         default=60,
         help='テスト時間（秒）。0で無制限（デフォルト: 60）'
     )
+    add_energy_gate_arguments(parser)
     
     args = parser.parse_args()
     
@@ -162,7 +153,8 @@ def main():
         tester = CustomWakeWordTester(
             args.ppn_file,
             args.wake_phrase,
-            args.sensitivity
+            args.sensitivity,
+            energy_gate=energy_gate_from_args(args)
         )
         tester.test(args.duration)
     except Exception as e:
@@ -8,11 +8,40 @@ import os
 import sys
 import time
 import json
+import array
+import threading
 from pathlib import Path
 from collections import defaultdict
+import numpy as np
 import pvporcupine
 import pvrecorder
 
+# 検出ログ（1検出1行のJSON Lines、検出のたびに追記する）
+DETECTION_LOG_FILE = "detection_log.jsonl"
+
+try:
+    from numba import njit
+
+    @njit(cache=True)
+    def compute_stats(times, indices, num_patterns, bucket_seconds):
+        """パターンごとの検出数と、時間区間×パターンの検出数を1パスで数える"""
+        num_buckets = int(times.max() // bucket_seconds) + 1 if times.size else 0
+        counts = np.zeros(num_patterns, dtype=np.int64)
+        bucket_counts = np.zeros((num_buckets, num_patterns), dtype=np.int64)
+        for k in range(times.size):
+            counts[indices[k]] += 1
+            bucket_counts[int(times[k] // bucket_seconds), indices[k]] += 1
+        return counts, bucket_counts
+except ImportError:  # numba未インストール時はnumpyで計算
+    def compute_stats(times, indices, num_patterns, bucket_seconds):
+        """パターンごとの検出数と、時間区間×パターンの検出数を数える"""
+        buckets = (times // bucket_seconds).astype(np.int64)
+        num_buckets = int(buckets.max()) + 1 if times.size else 0
+        counts = np.bincount(indices, minlength=num_patterns)
+        bucket_counts = np.zeros((num_buckets, num_patterns), dtype=np.int64)
+        np.add.at(bucket_counts, (buckets, indices), 1)
+        return counts, bucket_counts
+
 class MultiPatternTester:
     def __init__(self, patterns):
         """
@@ -25,7 +54,11 @@ class MultiPatternTester:
         
         # 統計情報
         self.stats = defaultdict(int)
-        self.detection_log = []
+        # 検出ログ（経過秒とパターン番号を別々のリストに持ち、集計時にndarrayにする）
+        self.detection_times = []
+        self.detection_indices = []
+        # ステータス表示スレッドと共有するので、statsの更新・読み出しはロックを取る
+        self.stats_lock = threading.Lock()
         
     def test(self, duration=180):  # 3分間
         """複数パターンのテスト実行"""
@@ -68,9 +101,21 @@ class MultiPatternTester:
         print("   - 早口や遅口でも試してみてください")
         print("\n終了: Ctrl+C\n")
         
+        # read_intoがあるpvrecorderでは、フレーム毎にリストを作らず同じバッファに読み込む
+        read_into = getattr(recorder, 'read_into', None)
+        pcm_buffer = array.array('h', bytes(2 * porcupine.frame_length))
+        
+        # 検出ログは溜め込まずに1行ずつ書き出す（中断してもそこまでのログが残る）
+        log_file = open(DETECTION_LOG_FILE, 'w', encoding='utf-8', buffering=1)
+        
         recorder.start()
         start_time = time.time()
-        last_update = time.time()
+        
+        # ステータス表示（5秒ごと）は別スレッドで行い、音声処理ループで標準出力に書かない
+        stop_status = threading.Event()
+        status_thread = threading.Thread(
+            target=self._status_loop, args=(start_time, duration, stop_status), daemon=True)
+        status_thread.start()
         
         try:
             while True:
@@ -82,13 +127,12 @@ class MultiPatternTester:
                     print(f"\n\nテスト完了（{duration}秒）")
                     break
                 
-                # ステータス更新（5秒ごと）
-                if current_time - last_update >= 5:
-                    self._print_status(elapsed, duration)
-                    last_update = current_time
-                
                 # 音声処理
-                pcm = recorder.read()
+                if read_into is not None:
+                    read_into(pcm_buffer)
+                    pcm = pcm_buffer
+                else:
+                    pcm = recorder.read()
                 result = porcupine.process(pcm)
                 
                 if result >= 0:
@@ -96,19 +140,21 @@ class MultiPatternTester:
                     phrase = pattern[1]
                     
                     # 統計更新
-                    self.stats[phrase] += 1
-                    self.detection_log.append({
-                        "time": elapsed,
-                        "phrase": phrase,
-                        "index": result
-                    })
+                    with self.stats_lock:
+                        self.stats[phrase] += 1
+                        count = self.stats[phrase]
+                        total = sum(self.stats.values())
+                    self.detection_times.append(elapsed)
+                    self.detection_indices.append(result)
+                    log_file.write(json.dumps(
+                        {"time": elapsed, "phrase": phrase, "index": result},
+                        ensure_ascii=False) + "\n")
                     
                     # 表示
-                    total = sum(self.stats.values())
-                    percentage = (self.stats[phrase] / total) * 100
+                    percentage = (count / total) * 100
                     
                     print(f"\n✅ 検出 #{total}: '{phrase}'")
-                    print(f"   このパターン: {self.stats[phrase]}回 ({percentage:.1f}%)")
+                    print(f"   このパターン: {count}回 ({percentage:.1f}%)")
                     
                     # 連続検出防止
                     time.sleep(1.5)
@@ -116,22 +162,32 @@ class MultiPatternTester:
         except KeyboardInterrupt:
             print("\n\nテスト中断")
         finally:
+            stop_status.set()
+            status_thread.join()
             recorder.stop()
             recorder.delete()
             porcupine.delete()
+            log_file.close()
             
         # 結果表示
         self.show_results(time.time() - start_time)
     
+    def _status_loop(self, start_time, duration, stop_event):
+        """ステータス表示スレッド: stop_eventがセットされるまで5秒ごとに表示"""
+        while not stop_event.wait(5):
+            self._print_status(time.time() - start_time, duration)
+    
     def _print_status(self, elapsed, duration):
         """ステータス表示"""
         remaining = duration - int(elapsed)
-        total = sum(self.stats.values())
+        with self.stats_lock:
+            stats = dict(self.stats)
+        total = sum(stats.values())
         
         status = f"\r⏱️ 残り: {remaining:3d}秒 | 総検出: {total}回"
         if total > 0:
             status += " | 内訳: "
-            for phrase, count in self.stats.items():
+            for phrase, count in stats.items():
                 pct = (count / total) * 100
                 status += f"{phrase}:{count}({pct:.0f}%) "
         
@@ -151,28 +207,32 @@ class MultiPatternTester:
             print("\n⚠️ 検出されませんでした")
             return
         
+        # 集計（パターン別・30秒区間別の検出数をまとめて求める）
+        counts, bucket_counts = compute_stats(
+            np.array(self.detection_times, dtype=np.float64),
+            np.array(self.detection_indices, dtype=np.int64),
+            len(self.patterns), 30.0)
+        phrases = [p[1] for p in self.patterns]
+        detected = [int(i) for i in np.argsort(-counts, kind='stable') if counts[i] > 0]
+        
         print(f"\n検出パターン分析:")
         print("-" * 40)
         
         # 各パターンの統計
-        for phrase, count in sorted(self.stats.items(), key=lambda x: x[1], reverse=True):
-            percentage = (count / total_detections) * 100
-            print(f"{phrase:20s}: {count:3d}回 ({percentage:5.1f}%)")
+        for index in detected:
+            percentage = (counts[index] / total_detections) * 100
+            print(f"{phrases[index]:20s}: {counts[index]:3d}回 ({percentage:5.1f}%)")
         
         # 時系列分析
         print(f"\n時系列分析:")
         print("-" * 40)
         
         # 30秒ごとの検出数
-        time_buckets = defaultdict(lambda: defaultdict(int))
-        for detection in self.detection_log:
-            bucket = int(detection['time'] / 30) * 30
-            time_buckets[bucket][detection['phrase']] += 1
-        
-        for bucket in sorted(time_buckets.keys()):
+        for b in np.flatnonzero(bucket_counts.any(axis=1)):
+            bucket = int(b) * 30
             print(f"{bucket:3d}-{bucket+30:3d}秒: ", end="")
-            for phrase, count in time_buckets[bucket].items():
-                print(f"{phrase}:{count} ", end="")
+            for index in np.flatnonzero(bucket_counts[b]):
+                print(f"{phrases[index]}:{bucket_counts[b, index]} ", end="")
             print()
         
         # 推奨事項
@@ -180,14 +240,13 @@ class MultiPatternTester:
         print("-" * 40)
         
         # 最も認識されたパターン
-        best_pattern = max(self.stats.items(), key=lambda x: x[1])
-        print(f"最も認識されやすい: '{best_pattern[0]}' ({best_pattern[1]}回)")
-        
-        # バランス分析
-        if len(self.stats) > 1:
-            counts = list(self.stats.values())
-            max_count = max(counts)
-            min_count = min(counts)
+        best = detected[0]
+        print(f"最も認識されやすい: '{phrases[best]}' ({counts[best]}回)")
+        
+        # バランス分析（検出されたパターン間で比較）
+        if len(detected) > 1:
+            max_count = int(counts[detected[0]])
+            min_count = int(counts[detected[-1]])
             
             if min_count == 0:
                 print("⚠️ 認識されないパターンがあります。感度調整が必要です。")
@@ -201,7 +260,7 @@ class MultiPatternTester:
         self.save_results()
     
     def save_results(self):
-        """結果をJSONで保存"""
+        """結果のサマリーをJSONで保存（検出ごとのログはDETECTION_LOG_FILEに書き出し済み）"""
         result_file = "test_results.json"
         
         data = {
@@ -214,13 +273,13 @@ class MultiPatternTester:
                 }
                 for p in self.patterns
             ],
-            "detection_log": self.detection_log
+            "detection_log_file": DETECTION_LOG_FILE
         }
         
         with open(result_file, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
         
-        print(f"\n📁 詳細ログを保存: {result_file}")
+        print(f"\n📁 結果を保存: {result_file}（検出ログ: {DETECTION_LOG_FILE}）")
 
 def main():
     # テストパターン定義
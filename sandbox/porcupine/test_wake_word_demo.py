@@ -7,6 +7,8 @@ import os
 import sys
 import time
 import threading
+import queue
+import array
 import pvporcupine
 import pvrecorder
 
@@ -19,6 +21,12 @@ class WakeWordDemo:
         self.porcupine = None
         self.recorder = None
         self.is_running = False
+        # 録音スレッド -> 検出ループへのフレーム受け渡し
+        self.frame_queue = queue.Queue(maxsize=32)
+        # read_intoで読み込む使い回しのバッファの空きリスト（検出ループが処理後に戻す）
+        self.free_buffers = queue.Queue()
+        self.read_into = None
+        self.capture_thread = None
         
     def initialize(self):
         """初期化"""
@@ -40,8 +48,67 @@ class WakeWordDemo:
             device_index=-1
         )
         
+        # read_intoがあるpvrecorderでは、フレーム毎にリストを作らず使い回しのバッファに読み込む
+        # （キュー内・検出中・読み込み中の分としてキュー長+2個を確保する）
+        self.read_into = getattr(self.recorder, 'read_into', None)
+        if self.read_into is not None:
+            frame_bytes = bytes(2 * self.porcupine.frame_length)
+            for _ in range(self.frame_queue.maxsize + 2):
+                self.free_buffers.put_nowait(array.array('h', frame_bytes))
+        
         print("✓ 初期化完了\n")
         
+    def _capture_loop(self):
+        """録音スレッド: レコーダーからフレームを読み続けてキューに積む
+        
+        検出側が表示などで遅れてもレコーダーの読み出しは止めない
+        （キューが一杯なら最も古いフレームを捨てる）
+        """
+        read = self.recorder.read
+        frame_queue = self.frame_queue
+        free_buffers = self.free_buffers
+        
+        while self.is_running:
+            try:
+                if self.read_into is not None:
+                    # 空きバッファに読み込む。空きがなければキューの最も古いフレームを捨てて
+                    # そのバッファを使う（検出ループが処理中のバッファは空きに戻るまで使わない）
+                    try:
+                        pcm = free_buffers.get_nowait()
+                    except queue.Empty:
+                        pcm = frame_queue.get_nowait()
+                    self.read_into(pcm)
+                else:
+                    pcm = read()
+            except queue.Empty:
+                continue  # 全バッファが使用中（キュー長+2個あるので通常は起きない）
+            except Exception:
+                break  # 停止済みのレコーダー
+            try:
+                frame_queue.put_nowait(pcm)
+            except queue.Full:
+                try:
+                    dropped = frame_queue.get_nowait()
+                    if self.read_into is not None:
+                        free_buffers.put_nowait(dropped)
+                except queue.Empty:
+                    pass
+                frame_queue.put_nowait(pcm)
+        
+    def _announce(self, detection_count, detected_word):
+        """検出表示（効果音的なアニメーションを含むので、検出ループとは別スレッドで実行）"""
+        print(f"\n{'🎯' * 15}")
+        print(f"検出！ #{detection_count}")
+        print(f"ワード: '{detected_word}'")
+        print(f"時刻: {time.strftime('%H:%M:%S')}")
+        print(f"{'🎯' * 15}\n")
+        
+        # 効果音的な表示
+        for i in range(3):
+            print(f"  {'✨' * (i+1)}", end='', flush=True)
+            time.sleep(0.2)
+        print("\n\n待機中...\n")
+        
     def run(self):
         """メインループ"""
         self.is_running = True
@@ -58,31 +125,36 @@ class WakeWordDemo:
         print("\n待機中...\n")
         
         self.recorder.start()
+        self.capture_thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self.capture_thread.start()
+        
+        # 連続検出防止（1秒）はフレーム数で数え、その間もフレームは推論し続けて検出だけ無視する
+        cooldown_frames = max(
+            1, int(1.0 * self.porcupine.sample_rate / self.porcupine.frame_length))
+        frames_since_detection = cooldown_frames  # 開始時はクールダウン済み
         
         try:
             detection_count = 0
             while self.is_running:
-                pcm = self.recorder.read()
+                try:
+                    pcm = self.frame_queue.get(timeout=1)
+                except queue.Empty:
+                    continue
                 keyword_index = self.porcupine.process(pcm)
+                if self.read_into is not None:
+                    self.free_buffers.put_nowait(pcm)  # 処理済みのバッファを空きに戻す
                 
-                if keyword_index >= 0:
+                frames_since_detection = min(frames_since_detection + 1, cooldown_frames)
+                if keyword_index >= 0 and frames_since_detection >= cooldown_frames:
+                    frames_since_detection = 0
                     detection_count += 1
-                    detected_word = keywords[keyword_index]
-                    
-                    print(f"\n{'🎯' * 15}")
-                    print(f"検出！ #{detection_count}")
-                    print(f"ワード: '{detected_word}'")
-                    print(f"時刻: {time.strftime('%H:%M:%S')}")
-                    print(f"{'🎯' * 15}\n")
-                    
-                    # 効果音的な表示
-                    for i in range(3):
-                        print(f"  {'✨' * (i+1)}", end='', flush=True)
-                        time.sleep(0.2)
-                    print("\n\n待機中...\n")
                     
-                    # 連続検出防止
-                    time.sleep(1)
+                    # 表示は別スレッドに任せ、検出ループはすぐ次のフレームに戻る
+                    threading.Thread(
+                        target=self._announce,
+                        args=(detection_count, keywords[keyword_index]),
+                        daemon=True
+                    ).start()
                     
         except KeyboardInterrupt:
             print("\n\n終了中...")
@@ -94,6 +166,9 @@ class WakeWordDemo:
         self.is_running = False
         if self.recorder:
             self.recorder.stop()
+            # 録音スレッドが読み出しを抜けてから解放する
+            if self.capture_thread:
+                self.capture_thread.join(timeout=1)
             self.recorder.delete()
         if self.porcupine:
             self.porcupine.delete()
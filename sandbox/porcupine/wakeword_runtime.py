@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Porcupine検出ループの共通部分
+各テストスクリプトは検出時・定期表示の処理だけを渡してrun_loop()を呼ぶ
+"""
+
+import array
+import time
+import numpy as np
+
+class EnergyGate:
+    """無音フレームでporcupine.processを省略するためのエネルギーゲート
+
+    直近history_frames分の平均パワー（int16単位の二乗）の最小値を環境ノイズとみなし、
+    そのmargin倍（かつmin_rmsの二乗以上）を閾値にする。
+    閾値を超えた後もhangover_framesの間は通す（Porcupineは内部状態を持つので、
+    発話の途中の小さい音でフレームが途切れないようにする）。
+    省略した直近preroll_frames分のフレームは保存しておき、ゲートが開いたときに
+    先に渡す（閾値を超える前の発話の立ち上がりを落とさない）
+    """
+    def __init__(self, min_rms=30.0, margin=4.0, history_frames=100,
+                 hangover_frames=32, preroll_frames=8):
+        self.min_power = min_rms ** 2
+        self.margin = margin
+        self.history = np.full(history_frames, np.inf)
+        self.history_index = 0
+        self.hangover_frames = hangover_frames
+        self.hangover_left = 0
+        self.preroll_frames = preroll_frames
+        self.preroll = None  # 最初のフレームの長さで確保する
+        self.preroll_index = 0
+        self.preroll_count = 0
+        self.frame_count = 0
+        self.skipped_count = 0
+
+    def is_silent(self, pcm):
+        """フレームが無音なら True（processを呼ばなくてよい）"""
+        # int16の二乗和はオーバーフローするのでfloat32で内積を取る
+        x = np.asarray(pcm, dtype=np.float32)
+        power = float(np.dot(x, x)) / x.size
+
+        # 直近フレームの最小値（環境ノイズ）を追跡
+        history = self.history
+        history[self.history_index] = power
+        self.history_index = (self.history_index + 1) % history.size
+        threshold = max(self.min_power, self.margin * float(history.min()))
+
+        self.frame_count += 1
+        if power >= threshold:
+            self.hangover_left = self.hangover_frames
+            return False
+        if self.hangover_left > 0:
+            self.hangover_left -= 1
+            return False
+        self.skipped_count += 1
+        self._keep_preroll(pcm)
+        return True
+
+    def _keep_preroll(self, pcm):
+        """省略したフレームを直近preroll_frames分だけ保存（pcmのバッファは使い回されるのでコピーする）"""
+        if self.preroll_frames <= 0:
+            return
+        if self.preroll is None:
+            self.preroll = np.empty((self.preroll_frames, len(pcm)), dtype=np.int16)
+        self.preroll[self.preroll_index] = pcm
+        self.preroll_index = (self.preroll_index + 1) % self.preroll_frames
+        self.preroll_count = min(self.preroll_count + 1, self.preroll_frames)
+
+    def take_preroll(self):
+        """保存している省略フレームを古い順に返して空にする（ゲートが開いた直後だけ中身がある）"""
+        count = self.preroll_count
+        if count == 0:
+            return ()
+        self.preroll_count = 0
+        start = self.preroll_index - count
+        return [self.preroll[i % self.preroll_frames] for i in range(start, start + count)]
+
+def add_energy_gate_arguments(parser):
+    """EnergyGateを有効にするコマンドライン引数を追加（既定は無効）"""
+    parser.add_argument('--energy-gate', action='store_true',
+                        help='無音フレームでウェイクワードの推論を省略する')
+    parser.add_argument('--energy-floor', type=float, default=30.0,
+                        help='--energy-gate使用時、これ未満のRMS（int16単位）は常に無音とみなす'
+                             '（小さい声や遠い声が検出されないときは下げる。デフォルト: 30）')
+
+def energy_gate_from_args(args):
+    """add_energy_gate_argumentsで追加した引数からEnergyGateを作る（無効ならNone）"""
+    if not args.energy_gate:
+        return None
+    return EnergyGate(min_rms=args.energy_floor)
+
+def cooldown_to_frames(porcupine, seconds):
+    """クールダウン時間（秒）をPorcupineのフレーム数に換算"""
+    return max(1, int(seconds * porcupine.sample_rate / porcupine.frame_length))
+
+def run_loop(porcupine, recorder, on_detect, duration_ns=0, cooldown_frames=0,
+             energy_gate=None, on_tick=None, tick_ns=1_000_000_000):
+    """録音を開始し、フレームをporcupineに渡して検出するたびにon_detectを呼ぶ
+
+    on_detect(keyword_index, now_ns): 検出時に呼ばれる。Trueを返すとループを終了する
+    duration_ns: 実行時間（ナノ秒）。0以下なら無制限
+    cooldown_frames: 検出後この数のフレームの間は検出を無視する（読み込みは止めない）
+    energy_gate: EnergyGate。Noneなら全フレームで推論する
+    on_tick(elapsed_ns): tick_nsごとに呼ばれる（ステータス表示用）
+
+    時間切れで終了したらTrue、on_detectで終了したらFalseを返す。
+    recorderの停止・解放は呼び出し側で行う
+    """
+    # read_intoがあるpvrecorderでは、フレーム毎にリストを作らず同じバッファに読み込む
+    read_into = getattr(recorder, 'read_into', None)
+    pcm_buffer = array.array('h', bytes(2 * porcupine.frame_length))
+
+    # ループ内で毎回引く属性はローカル変数に束縛しておく
+    read = recorder.read
+    process = porcupine.process
+    monotonic_ns = time.monotonic_ns
+    is_silent = energy_gate.is_silent if energy_gate is not None else None
+    take_preroll = energy_gate.take_preroll if energy_gate is not None else None
+    frames_since_detection = cooldown_frames  # 開始時はクールダウン済み
+
+    recorder.start()
+    # 時刻はループ先頭で1回だけ取得し、整数のナノ秒で比較する
+    start_ns = monotonic_ns()
+    end_ns = start_ns + duration_ns if duration_ns > 0 else None
+    next_tick_ns = start_ns
+
+    while True:
+        now_ns = monotonic_ns()
+
+        # 終了条件
+        if end_ns is not None and now_ns >= end_ns:
+            return True
+
+        # 定期処理
+        if on_tick is not None and now_ns >= next_tick_ns:
+            on_tick(now_ns - start_ns)
+            next_tick_ns = now_ns + tick_ns
+
+        # 音声フレームを取得
+        if read_into is not None:
+            read_into(pcm_buffer)
+            pcm = pcm_buffer
+        else:
+            pcm = read()
+
+        frames_since_detection = min(frames_since_detection + 1, cooldown_frames)
+
+        # 無音フレームはニューラルネットの推論を省略する
+        keyword_index = -1
+        if is_silent is not None:
+            if is_silent(pcm):
+                continue
+            # ゲートが開いた直後は、省略していた直前のフレームを先に渡す
+            for frame in take_preroll():
+                index = process(frame)
+                if index >= 0:
+                    keyword_index = index
+
+        # ウェイクワード検出
+        index = process(pcm)
+        if index >= 0:
+            keyword_index = index
+        if keyword_index >= 0 and frames_since_detection >= cooldown_frames:
+            frames_since_detection = 0
+            if on_detect(keyword_index, now_ns):
+                return False
@@ -49,36 +49,28 @@ def test_pyttsx3():
     else:
         print("\n警告: 日本語音声が見つかりません。デフォルト音声を使用します。")
     
-    # 音声の保存と再生
+    # 音声の保存（全テキストをキューに積み、runAndWaitは1回だけ）
     for i, text in enumerate(test_texts):
         print(f"\nテキスト {i+1}: {text}")
-        
-        # 音声ファイルに保存
-        filename = f"outputs/pyttsx3_test_{i+1}.wav"
-        start_time = time.time()
-        
-        engine.save_to_file(text, filename)
-        engine.runAndWait()
-        
-        save_time = time.time() - start_time
-        print(f"  保存時間: {save_time:.3f}秒")
+        engine.save_to_file(text, f"outputs/pyttsx3_test_{i+1}.wav")
         
         # 直接音声再生（オプショナル）
         # engine.say(text)
-        # engine.runAndWait()
     
-    # 速度を変更してテスト
-    print("\n速度変更テスト:")
-    engine.setProperty('rate', 150)  # 遅く
-    filename = "outputs/pyttsx3_slow.wav"
-    engine.save_to_file("ゆっくり話します。", filename)
+    start_time = time.time()
     engine.runAndWait()
-    print("  遅い速度で保存: pyttsx3_slow.wav")
+    save_time = time.time() - start_time
+    print(f"\n  保存時間: {save_time:.3f}秒（{len(test_texts)}件、"
+          f"平均 {save_time / len(test_texts):.3f}秒/件）")
     
+    # 速度を変更してテスト（setPropertyもキューに積まれるので、続けて積んでから1回で実行）
+    print("\n速度変更テスト:")
+    engine.setProperty('rate', 150)  # 遅く
+    engine.save_to_file("ゆっくり話します。", "outputs/pyttsx3_slow.wav")
     engine.setProperty('rate', 250)  # 速く
-    filename = "outputs/pyttsx3_fast.wav"
-    engine.save_to_file("速く話します。", filename)
+    engine.save_to_file("速く話します。", "outputs/pyttsx3_fast.wav")
     engine.runAndWait()
+    print("  遅い速度で保存: pyttsx3_slow.wav")
     print("  速い速度で保存: pyttsx3_fast.wav")
     
     # エンジンを停止
@@ -7,29 +7,50 @@ import subprocess
 import time
 import os
 import platform
+import re
+import functools
+from collections import deque
 
+# 同時に走らせるsayプロセスの上限
+MAX_INFLIGHT = 4
+
+# `say -v ?` の1行（例: "Kyoko               ja_JP    # こんにちは、..."）
+# 音声名は空白を含むことがあるので、言語コードの手前までを名前とする
+VOICE_LINE = re.compile(r'^(.+?)\s+([a-z]{2,3}[_-]\w+)\s+#\s*(.*)$')
+
+@functools.lru_cache(maxsize=1)
 def get_available_voices():
-    """利用可能な音声のリストを取得"""
+    """利用可能な音声のリストを取得（`say -v ?` の実行は初回だけ）"""
     result = subprocess.run(['say', '-v', '?'], capture_output=True, text=True)
-    voices = []
-    
-    for line in result.stdout.strip().split('\n'):
-        if line:
-            parts = line.split('#')
-            if len(parts) >= 2:
-                voice_info = parts[0].strip()
-                voice_parts = voice_info.split()
-                if voice_parts:
-                    voice_name = voice_parts[0]
-                    lang_code = voice_parts[1] if len(voice_parts) > 1 else ''
-                    description = parts[1].strip()
-                    voices.append({
-                        'name': voice_name,
-                        'lang': lang_code,
-                        'description': description
-                    })
-    
-    return voices
+    return [
+        {'name': m[1], 'lang': m[2], 'description': m[3].strip()}
+        for line in result.stdout.splitlines()
+        if (m := VOICE_LINE.match(line))
+    ]
+
+def run_say_jobs(jobs, max_inflight=MAX_INFLIGHT):
+    """sayコマンドをまとめて並列に実行し、各ジョブの所要時間（秒）を投入順に返す
+    
+    -oでファイルに書き出すジョブは音声デバイスを取り合わないので、
+    前のジョブの合成中に次のプロセスを起動しておく（同時実行はmax_inflightまで）
+    """
+    elapsed = [0.0] * len(jobs)
+    running = deque()  # (ジョブ番号, プロセス, 開始時刻)
+    
+    def wait_oldest():
+        i, proc, start_time = running.popleft()
+        proc.wait()
+        elapsed[i] = time.time() - start_time
+    
+    for i, argv in enumerate(jobs):
+        if len(running) >= max_inflight:
+            wait_oldest()
+        proc = subprocess.Popen(argv, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        running.append((i, proc, time.time()))
+    while running:
+        wait_oldest()
+    
+    return elapsed
 
 def test_macos_say():
     """macOS sayコマンドのテスト"""
@@ -67,62 +88,41 @@ def test_macos_say():
     default_voice = japanese_voices[0]['name']
     print(f"\n使用する音声: {default_voice}")
     
+    # 全ジョブのコマンドラインを先に組み立て、まとめて並列に実行する
+    jobs = []
+    
     # 各テキストで音声を生成
-    for i, text in enumerate(test_texts):
+    text_files = [f"outputs/macos_say_{i+1}.aiff" for i in range(len(test_texts))]
+    for text, filename in zip(test_texts, text_files):
+        jobs.append(['say', '-v', default_voice, '-o', filename, text])
+    
+    # 速度変更テスト（通常は約200）
+    slow_file = "outputs/macos_say_slow.aiff"
+    fast_file = "outputs/macos_say_fast.aiff"
+    jobs.append(['say', '-v', default_voice, '-r', '120', '-o', slow_file, 'ゆっくり話します。'])
+    jobs.append(['say', '-v', default_voice, '-r', '300', '-o', fast_file, '速く話します。'])
+    
+    # 異なる日本語音声でテスト（最大3つまで）
+    other_voices = [voice['name'] for voice in japanese_voices[1:3]]
+    for name in other_voices:
+        jobs.append(['say', '-v', name, '-o', f"outputs/macos_say_{name}.aiff",
+                     'この音声は' + name + 'です。'])
+    
+    elapsed = run_say_jobs(jobs)
+    
+    for i, (text, filename) in enumerate(zip(test_texts, text_files)):
         print(f"\nテキスト {i+1}: {text}")
-        
-        # 音声ファイルに保存
-        filename = f"outputs/macos_say_{i+1}.aiff"
-        start_time = time.time()
-        
-        subprocess.run([
-            'say',
-            '-v', default_voice,
-            '-o', filename,
-            text
-        ])
-        
-        save_time = time.time() - start_time
-        print(f"  保存時間: {save_time:.3f}秒")
+        print(f"  保存時間: {elapsed[i]:.3f}秒")
         print(f"  ファイル: {filename}")
     
-    # 速度変更テスト
     print("\n速度変更テスト:")
+    print(f"  遅い速度で保存: {slow_file}")
+    print(f"  速い速度で保存: {fast_file}")
     
-    # 遅い速度
-    filename = "outputs/macos_say_slow.aiff"
-    subprocess.run([
-        'say',
-        '-v', default_voice,
-        '-r', '120',  # 通常は約200
-        '-o', filename,
-        'ゆっくり話します。'
-    ])
-    print(f"  遅い速度で保存: {filename}")
-    
-    # 速い速度
-    filename = "outputs/macos_say_fast.aiff"
-    subprocess.run([
-        'say',
-        '-v', default_voice,
-        '-r', '300',
-        '-o', filename,
-        '速く話します。'
-    ])
-    print(f"  速い速度で保存: {filename}")
-    
-    # 異なる日本語音声でテスト
-    if len(japanese_voices) > 1:
+    if other_voices:
         print("\n他の日本語音声でテスト:")
-        for voice in japanese_voices[1:3]:  # 最大3つまで
-            filename = f"outputs/macos_say_{voice['name']}.aiff"
-            subprocess.run([
-                'say',
-                '-v', voice['name'],
-                '-o', filename,
-                'この音声は' + voice['name'] + 'です。'
-            ])
-            print(f"  {voice['name']}: {filename}")
+        for name in other_voices:
+            print(f"  {name}: outputs/macos_say_{name}.aiff")
     
     # 直接再生のデモ（コメント化）
     # print("\n直接再生のデモ:")
@@ -8,40 +8,45 @@ VOICEVOXのテスト
 2. VOICEVOXアプリを起動（自動的にローカルサーバーが起動）
 """
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import time
 import wave
 import subprocess
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 class VoiceVoxClient:
     def __init__(self, host='localhost', port=50021):
         self.base_url = f'http://{host}:{port}'
+        # 接続を使い回す（リクエスト毎のTCP接続確立を避ける）
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=4))
     
     def is_server_running(self):
         """VOICEVOXサーバーが起動しているか確認"""
         try:
-            response = requests.get(f'{self.base_url}/version', timeout=1)
+            response = self.session.get(f'{self.base_url}/version', timeout=1)
             return response.status_code == 200
         except:
             return False
     
     def get_speakers(self):
         """利用可能な話者のリストを取得"""
-        response = requests.get(f'{self.base_url}/speakers')
+        response = self.session.get(f'{self.base_url}/speakers')
         return response.json()
     
     def generate_audio_query(self, text, speaker_id=1):
         """音声合成用のクエリを作成"""
         params = {'text': text, 'speaker': speaker_id}
-        response = requests.post(f'{self.base_url}/audio_query', params=params)
+        response = self.session.post(f'{self.base_url}/audio_query', params=params)
         return response.json()
     
     def synthesize(self, audio_query, speaker_id=1):
         """音声を合成"""
         params = {'speaker': speaker_id}
         headers = {'Content-Type': 'application/json'}
-        response = requests.post(
+        response = self.session.post(
             f'{self.base_url}/synthesis',
             params=params,
             data=json.dumps(audio_query),
@@ -97,13 +102,12 @@ def test_voicevox():
     # 異なる話者でテスト（デフォルトの話者IDを使用）
     test_speaker_ids = [1, 2, 3, 8, 10]  # ずんだもん、四国めたん、等
     
-    for speaker_id in test_speaker_ids[:3]:  # 最初の3人でテスト
-        print(f"\n話者ID {speaker_id} でテスト:")
-        
-        # 最初のテキストで音声を生成
-        text = test_texts[0]
-        print(f"  テキスト: {text}")
-        
+    # 最初のテキストで音声を生成
+    text = test_texts[0]
+    
+    def run_speaker(speaker_id):
+        """1話者分のクエリ生成・合成・保存（表示行を返し、出力順は呼び出し側で揃える）"""
+        lines = [f"\n話者ID {speaker_id} でテスト:", f"  テキスト: {text}"]
         try:
             # 音声クエリの生成
             start_time = time.time()
@@ -119,35 +123,49 @@ def test_voicevox():
             filename = f"outputs/voicevox_speaker{speaker_id}.wav"
             client.save_audio(audio_data, filename)
             
-            print(f"  クエリ生成時間: {query_time:.3f}秒")
-            print(f"  音声合成時間: {synthesis_time:.3f}秒")
-            print(f"  保存先: {filename}")
+            lines.append(f"  クエリ生成時間: {query_time:.3f}秒")
+            lines.append(f"  音声合成時間: {synthesis_time:.3f}秒")
+            lines.append(f"  保存先: {filename}")
             
         except Exception as e:
-            print(f"  エラー: {e}")
+            lines.append(f"  エラー: {e}")
+        return lines
+    
+    # 話者ごとのリクエストは独立しているので並列に投げる（最初の3人でテスト）
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        for lines in executor.map(run_speaker, test_speaker_ids[:3]):
+            print("\n".join(lines))
     
     # 速度調整テスト
     print("\n速度調整テスト:")
     text = "速度を変更して話します。"
     speaker_id = 1
     
-    for speed_scale in [0.7, 1.0, 1.3]:
+    def run_speed(speed_scale):
+        """1速度分の合成・保存（クエリは共有し、speedScaleだけ変えたコピーを使う）"""
         try:
-            # 音声クエリの生成
-            audio_query = client.generate_audio_query(text, speaker_id)
             # 速度を変更
-            audio_query['speedScale'] = speed_scale
+            query = dict(audio_query, speedScale=speed_scale)
             
             # 音声の合成
-            audio_data = client.synthesize(audio_query, speaker_id)
+            audio_data = client.synthesize(query, speaker_id)
             
             # ファイルに保存
             filename = f"outputs/voicevox_speed_{speed_scale}.wav"
             client.save_audio(audio_data, filename)
-            print(f"  速度 {speed_scale}x: {filename}")
+            return f"  速度 {speed_scale}x: {filename}"
             
         except Exception as e:
-            print(f"  エラー: {e}")
+            return f"  エラー: {e}"
+    
+    try:
+        # 音声クエリの生成（速度以外は同じなので1回だけ）
+        audio_query = client.generate_audio_query(text, speaker_id)
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            for line in executor.map(run_speed, [0.7, 1.0, 1.3]):
+                print(line)
+    except Exception as e:
+        print(f"  エラー: {e}")
     
     print("\n=== VOICEVOX テスト完了 ===")
     
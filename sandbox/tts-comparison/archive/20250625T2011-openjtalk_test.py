@@ -8,17 +8,89 @@ import numpy as np
 import wave
 import time
 import os
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from numba import njit
+
+    @njit(cache=True, fastmath=True)
+    def resample_linear(x, ratio):
+        """ratio間隔で線形補間して読み直す（ratio>1で速く、<1で遅くなる）
+        
+        np.interp(np.arange(0, len(x), ratio), np.arange(len(x)), x) と同じ結果を、
+        インデックス配列を作らず1ループで計算する
+        """
+        n = x.shape[0]
+        m = int(np.ceil(n / ratio))
+        out = np.empty(m, dtype=x.dtype)
+        for i in range(m):
+            p = i * ratio
+            j = int(p)
+            if j + 1 < n:
+                f = p - j
+                out[i] = x[j] * (1 - f) + x[j + 1] * f
+            else:
+                out[i] = x[n - 1]
+        return out
+except ImportError:  # numba未インストール時はnp.interpで計算
+    def resample_linear(x, ratio):
+        """ratio間隔で線形補間して読み直す（ratio>1で速く、<1で遅くなる）"""
+        return np.interp(np.arange(0, len(x), ratio), np.arange(len(x)), x)
+
+# save_waveの変換用作業バッファ（呼び出しをまたいで使い回し、足りなければ拡張する）
+_scratch = np.empty(0, dtype=np.float32)
 
 def save_wave(filename, audio, sample_rate=48000):
     """音声データをWAVファイルとして保存"""
-    # float32をint16に変換
-    audio_int16 = (audio * 32767).astype(np.int16)
+    global _scratch
+    if _scratch.size < len(audio):
+        _scratch = np.empty(len(audio), dtype=np.float32)
+    buf = _scratch[:len(audio)]
+    
+    # float32の作業バッファ上でスケーリングとクリップを済ませてからint16に変換
+    # （float64の一時配列を作らない。範囲外はラップせず飽和させる）
+    np.multiply(audio, 32767.0, out=buf)
+    np.clip(buf, -32768, 32767, out=buf)
+    audio_int16 = buf.astype(np.int16)
     
     with wave.open(filename, 'wb') as wf:
         wf.setnchannels(1)  # モノラル
         wf.setsampwidth(2)  # 16bit
         wf.setframerate(sample_rate)
-        wf.writeframes(audio_int16.tobytes())
+        # フレーム数を先に設定しておくと、close時にヘッダを書き直すシークが要らない
+        wf.setnframes(len(audio_int16))
+        # ndarrayはバッファとしてそのまま渡せる（tobytes()のコピーを作らない）
+        wf.writeframes(audio_int16)
+
+def load_pyopenjtalk():
+    """辞書と音響モデルを読み込んでおく（ワーカープロセスの初期化用）
+
+    どちらも初回使用時に読み込まれるので、合成時間の計測に含めないよう先に済ませる
+    """
+    pyopenjtalk.tts("あ")
+
+def synth_one(i_text):
+    """1テキスト分の合成・保存（ワーカープロセスで実行し、表示行を返す）"""
+    i, text = i_text
+    lines = [f"\nテキスト {i+1}: {text}"]
+    try:
+        # 音声合成
+        start_time = time.time()
+        audio, sr = pyopenjtalk.tts(text)
+        synthesis_time = time.time() - start_time
+        
+        # ファイルに保存
+        filename = f"outputs/openjtalk_test_{i+1}.wav"
+        save_wave(filename, audio, sr)
+        
+        lines.append(f"  合成時間: {synthesis_time:.3f}秒")
+        lines.append(f"  サンプルレート: {sr}Hz")
+        lines.append(f"  音声長: {len(audio)/sr:.2f}秒")
+        lines.append(f"  保存先: {filename}")
+        
+    except Exception as e:
+        lines.append(f"  エラー: {e}")
+    return lines
 
 def test_pyopenjtalk():
     """pyopenjltalkのテスト"""
@@ -38,27 +110,15 @@ def test_pyopenjtalk():
         "英語混じり：Hello, これはテストです。",
     ]
     
-    # 各テキストで音声を生成
-    for i, text in enumerate(test_texts):
-        print(f"\nテキスト {i+1}: {text}")
-        
-        try:
-            # 音声合成
-            start_time = time.time()
-            audio, sr = pyopenjtalk.tts(text)
-            synthesis_time = time.time() - start_time
-            
-            # ファイルに保存
-            filename = f"outputs/openjtalk_test_{i+1}.wav"
-            save_wave(filename, audio, sr)
-            
-            print(f"  合成時間: {synthesis_time:.3f}秒")
-            print(f"  サンプルレート: {sr}Hz")
-            print(f"  音声長: {len(audio)/sr:.2f}秒")
-            print(f"  保存先: {filename}")
-            
-        except Exception as e:
-            print(f"  エラー: {e}")
+    # 辞書は初回使用時にダウンロード・展開される（排他制御なし）ので、
+    # ワーカーが同時に展開しないよう親プロセスで先に済ませておく
+    pyopenjtalk.g2p("あ")
+    
+    # 各テキストで音声を生成（CPUバウンドなのでプロセスを分けて並列に合成する）
+    with ProcessPoolExecutor(max_workers=min(len(test_texts), os.cpu_count() or 1),
+                             initializer=load_pyopenjtalk) as executor:
+        for lines in executor.map(synth_one, enumerate(test_texts)):
+            print("\n".join(lines))
     
     # 速度変更テスト
     print("\n速度変更テスト:")
@@ -71,20 +131,12 @@ def test_pyopenjtalk():
     
     # 速度変更（リサンプリングで実現）
     # 遅い速度（0.8倍）
-    audio_slow = np.interp(
-        np.arange(0, len(audio_normal), 0.8),
-        np.arange(0, len(audio_normal)),
-        audio_normal
-    )
+    audio_slow = resample_linear(audio_normal, 0.8)
     save_wave("outputs/openjtalk_speed_slow.wav", audio_slow, sr)
     print("  遅い速度(0.8x): openjtalk_speed_slow.wav")
     
     # 速い速度（1.2倍）
-    audio_fast = np.interp(
-        np.arange(0, len(audio_normal), 1.2),
-        np.arange(0, len(audio_normal)),
-        audio_normal
-    )
+    audio_fast = resample_linear(audio_normal, 1.2)
     save_wave("outputs/openjtalk_speed_fast.wav", audio_fast, sr)
     print("  速い速度(1.2x): openjtalk_speed_fast.wav")
     
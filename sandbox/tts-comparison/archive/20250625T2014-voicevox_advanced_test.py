@@ -4,7 +4,6 @@ VOICEVOXの詳細テスト
 エンジンのダウンロードから音声合成まで
 """
 import requests
-import json
 import time
 import wave
 import subprocess
@@ -12,11 +11,19 @@ import os
 import sys
 import platform
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+# クエリ生成・合成・キャッシュは親ディレクトリのtts_core.pyを共有する
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tts_core import (SESSION, cached_synthesize, get_audio_query, load_speakers,
+                      synth_to_file, synthesize_to_file)
 
 class VoiceVoxAdvancedClient:
     def __init__(self, host='localhost', port=50021):
         self.base_url = f'http://{host}:{port}'
         self.engine_process = None
+        self.speakers = None       # /speakersの結果（初回の取得で埋める）
+        self.speaker_index = None  # 「話者名/スタイル名」→スタイルID
     
     def check_engine_path(self):
         """VOICEVOXエンジンのパスを確認"""
@@ -31,9 +38,13 @@ class VoiceVoxAdvancedClient:
             Path.home() / "Downloads" / "voicevox_engine-macos-x64-cpu",
         ]
         
+        # runのstat 1回で、ディレクトリとrunの有無をまとめて確認する
         for path in possible_paths:
-            if path.exists() and (path / "run").exists():
-                return path
+            try:
+                os.stat(path / "run")
+            except OSError:
+                continue
+            return path
         
         return None
     
@@ -52,20 +63,33 @@ class VoiceVoxAdvancedClient:
         print(f"エンジンを起動中: {run_path}")
         
         try:
-            # 実行権限を付与（macOSの場合）
+            # 実行権限を付与（macOSの場合、既に付いていればメタデータを書き換えない）
             if platform.system() == 'Darwin':
-                os.chmod(run_path, 0o755)
+                if not os.stat(run_path).st_mode & 0o100:
+                    os.chmod(run_path, 0o755)
             
             # エンジンを起動
             self.engine_process = subprocess.Popen([str(run_path)])
             
-            # 起動を待つ
-            for i in range(30):
+            # 起動を待つ（50msから間隔を1.6倍ずつ延ばし、最大1秒間隔で30秒まで待つ）
+            start = time.monotonic()
+            deadline = start + 30
+            delay = 0.05
+            last_progress = start
+            while time.monotonic() < deadline:
                 if self.is_server_running():
+                    if last_progress > start:
+                        print()  # 経過時間の行を確定させる
                     print("✓ VOICEVOXエンジンが起動しました")
                     return True
-                time.sleep(1)
-                print(".", end="", flush=True)
+                time.sleep(delay)
+                delay = min(delay * 1.6, 1.0)
+                # 経過時間は同じ行を書き換えて表示する（更新は最大10Hz）
+                now = time.monotonic()
+                if now - last_progress >= 0.1:
+                    last_progress = now
+                    sys.stdout.write(f"\r起動待ち: {now - start:.1f}秒")
+                    sys.stdout.flush()
             
             print("\nエラー: エンジンの起動タイムアウト")
             return False
@@ -84,53 +108,56 @@ class VoiceVoxAdvancedClient:
     def is_server_running(self):
         """VOICEVOXサーバーが起動しているか確認"""
         try:
-            response = requests.get(f'{self.base_url}/version', timeout=1)
-            return response.status_code == 200
-        except:
+            response = SESSION.get(f'{self.base_url}/version', timeout=0.5)
+            return response.ok
+        except requests.RequestException:
             return False
     
     def get_version(self):
         """VOICEVOXのバージョン情報を取得"""
-        response = requests.get(f'{self.base_url}/version')
+        response = SESSION.get(f'{self.base_url}/version')
         return response.text
     
     def get_speakers(self):
-        """利用可能な話者のリストを取得"""
-        response = requests.get(f'{self.base_url}/speakers')
-        return response.json()
+        """利用可能な話者のリストを取得（問い合わせは初回だけ、直近の結果はファイルから読む）"""
+        if self.speakers is None:
+            self.speakers = load_speakers(SESSION, self.base_url)
+        return self.speakers
+    
+    def get_speaker_index(self):
+        """「話者名/スタイル名」からスタイルIDを引く辞書を返す（作るのは初回だけ）"""
+        if self.speaker_index is None:
+            self.speaker_index = {
+                f"{speaker['name']}/{style['name']}": style['id']
+                for speaker in self.get_speakers()
+                for style in speaker['styles']
+            }
+        return self.speaker_index
     
     def generate_audio_query(self, text, speaker_id=1):
-        """音声合成用のクエリを作成"""
-        params = {'text': text, 'speaker': speaker_id}
-        response = requests.post(f'{self.base_url}/audio_query', params=params)
-        return response.json()
+        """音声合成用のクエリを作成（同じテキスト・話者は問い合わせ済みの結果のコピーを返す）"""
+        return get_audio_query(SESSION, text, speaker_id, self.base_url)
     
     def synthesize(self, audio_query, speaker_id=1):
         """音声を合成"""
-        params = {'speaker': speaker_id}
-        headers = {'Content-Type': 'application/json'}
-        response = requests.post(
-            f'{self.base_url}/synthesis',
-            params=params,
-            data=json.dumps(audio_query),
-            headers=headers
-        )
-        return response.content
+        return cached_synthesize(SESSION, audio_query, speaker_id, self.base_url)
+    
+    def synthesize_to_file(self, audio_query, speaker_id, filename):
+        """音声を合成してファイルに保存"""
+        return synthesize_to_file(SESSION, audio_query, speaker_id, filename, self.base_url)
     
     def text_to_speech(self, text, speaker_id=1, filename=None):
-        """テキストから音声を生成（簡易版）"""
-        # クエリ生成
-        audio_query = self.generate_audio_query(text, speaker_id)
+        """テキストから音声を生成（簡易版）
         
-        # 音声合成
-        audio_data = self.synthesize(audio_query, speaker_id)
-        
-        # ファイルに保存
+        filenameを指定した場合は保存先を、省略した場合は音声データを返す
+        """
+        # ファイルに保存（音声データはメモリに載せない）
         if filename:
-            with open(filename, 'wb') as f:
-                f.write(audio_data)
+            return synth_to_file(SESSION, text, speaker_id, filename, base_url=self.base_url)
         
-        return audio_data
+        # 音声合成
+        audio_query = self.generate_audio_query(text, speaker_id)
+        return self.synthesize(audio_query, speaker_id)
 
 def test_voicevox_advanced():
     """VOICEVOXの詳細テスト"""
@@ -148,10 +175,15 @@ def test_voicevox_advanced():
     else:
         print("✓ サーバーは既に起動しています")
     
+    # バージョン情報と話者一覧は互いに依存しないので同時に問い合わせる
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        version_future = executor.submit(client.get_version)
+        speakers_future = executor.submit(client.get_speakers)
+    
     # バージョン情報
     print("\n2. バージョン情報:")
     try:
-        version = client.get_version()
+        version = version_future.result()
         print(f"  VOICEVOX Engine: {version}")
     except Exception as e:
         print(f"  エラー: {e}")
@@ -159,7 +191,7 @@ def test_voicevox_advanced():
     # 利用可能な話者を取得
     print("\n3. 利用可能な話者:")
     try:
-        speakers = client.get_speakers()
+        speakers = speakers_future.result()
         print(f"  話者数: {len(speakers)}")
         
         # 人気キャラクターを表示
@@ -186,16 +218,18 @@ def test_voicevox_advanced():
     # 音声合成テスト
     print("\n4. 音声合成テスト:")
     
+    # 話者IDは名前から引く（一覧が取れなかった場合は既定のIDを使う）
+    speaker_index = client.get_speaker_index() if speakers else {}
+    
     test_cases = [
-        {"text": "こんにちは、私はずんだもんなのだ！", "speaker_id": 3, "name": "ずんだもん"},
-        {"text": "VOICEVOXは高品質な音声合成ができます。", "speaker_id": 2, "name": "四国めたん"},
-        {"text": "今日はいい天気ですね。", "speaker_id": 8, "name": "春日部つむぎ"},
+        {"text": "こんにちは、私はずんだもんなのだ！", "speaker_id": speaker_index.get("ずんだもん/ノーマル", 3), "name": "ずんだもん"},
+        {"text": "VOICEVOXは高品質な音声合成ができます。", "speaker_id": speaker_index.get("四国めたん/ノーマル", 2), "name": "四国めたん"},
+        {"text": "今日はいい天気ですね。", "speaker_id": speaker_index.get("春日部つむぎ/ノーマル", 8), "name": "春日部つむぎ"},
     ]
     
-    for i, test in enumerate(test_cases):
-        print(f"\n  テスト{i+1}: {test['name']}")
-        print(f"  テキスト: {test['text']}")
-        
+    def run_case(test):
+        """1ケース分の生成（表示行を返し、出力順は呼び出し側で揃える）"""
+        lines = []
         try:
             # 時間計測
             start_time = time.time()
@@ -209,16 +243,24 @@ def test_voicevox_advanced():
             )
             
             total_time = time.time() - start_time
-            print(f"  生成時間: {total_time:.3f}秒")
-            print(f"  保存先: {filename}")
+            lines.append(f"  生成時間: {total_time:.3f}秒")
+            lines.append(f"  保存先: {filename}")
             
         except Exception as e:
-            print(f"  エラー: {e}")
+            lines.append(f"  エラー: {e}")
+        return lines
+    
+    # 各ケースは独立したリクエストなので並列に投げる
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        for i, (test, lines) in enumerate(zip(test_cases, executor.map(run_case, test_cases))):
+            print(f"\n  テスト{i+1}: {test['name']}")
+            print(f"  テキスト: {test['text']}")
+            print("\n".join(lines))
     
     # パラメータ調整テスト
     print("\n5. パラメータ調整テスト:")
     text = "パラメータを調整して話します。"
-    base_speaker_id = 3  # ずんだもん
+    base_speaker_id = speaker_index.get("ずんだもん/ノーマル", 3)  # ずんだもん
     
     # 速度変更
     for speed_scale in [0.7, 1.0, 1.5]:
@@ -226,10 +268,8 @@ def test_voicevox_advanced():
             query = client.generate_audio_query(text, base_speaker_id)
             query['speedScale'] = speed_scale
             
-            audio_data = client.synthesize(query, base_speaker_id)
             filename = f"outputs/voicevox_speed_{speed_scale}.wav"
-            with open(filename, 'wb') as f:
-                f.write(audio_data)
+            client.synthesize_to_file(query, base_speaker_id, filename)
             
             print(f"  速度 {speed_scale}x: {filename}")
         except Exception as e:
@@ -241,10 +281,8 @@ def test_voicevox_advanced():
             query = client.generate_audio_query(text, base_speaker_id)
             query['pitchScale'] = pitch_scale
             
-            audio_data = client.synthesize(query, base_speaker_id)
             filename = f"outputs/voicevox_pitch_{pitch_scale}.wav"
-            with open(filename, 'wb') as f:
-                f.write(audio_data)
+            client.synthesize_to_file(query, base_speaker_id, filename)
             
             print(f"  ピッチ {pitch_scale}x: {filename}")
         except Exception as e:
@@ -8,10 +8,25 @@ import platform
 import requests
 import zipfile
 import tarfile
+import shutil
 import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import json
 
+# ダウンロードの読み込み単位と進捗表示の最小間隔（秒）
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+PROGRESS_INTERVAL = 0.25
+
+# 展開時に書き込みを並列に行うスレッド数と、読み込み済みで書き込み待ちのデータ量の上限
+EXTRACT_WORKERS = min(8, os.cpu_count() or 1)
+MAX_PENDING_BYTES = 64 * 1024 * 1024
+# これより大きいメンバー（ライブラリやモデル）はメモリに読み込まず、その場でファイルに流し込む
+STREAM_MEMBER_SIZE = 8 * 1024 * 1024
+
 def get_system_info():
     """システム情報を取得"""
     system = platform.system()
@@ -40,34 +55,126 @@ def get_latest_release_info():
     return response.json()
 
 def download_file(url, dest_path):
-    """ファイルをダウンロード"""
+    """ファイルをダウンロード
+
+    途中で失敗・中断しても書きかけのファイルを完全なアーカイブと取り違えないよう、
+    dest_path + '.part' に書いてから名前を変える
+    """
     print(f"ダウンロード中: {url}")
     
+    dest_path = Path(dest_path)
+    part_path = dest_path.with_name(dest_path.name + '.part')
     response = requests.get(url, stream=True)
+    response.raise_for_status()
     total_size = int(response.headers.get('content-length', 0))
     
-    with open(dest_path, 'wb') as f:
-        downloaded = 0
-        for chunk in response.iter_content(chunk_size=8192):
-            if chunk:
-                f.write(chunk)
-                downloaded += len(chunk)
-                if total_size > 0:
-                    progress = downloaded / total_size * 100
-                    print(f"\r進捗: {progress:.1f}%", end="", flush=True)
+    try:
+        with open(part_path, 'wb') as f:
+            # 最終サイズを先に確保しておく（ファイルシステムが連続した領域を割り当てやすい）
+            if total_size > 0:
+                os.ftruncate(f.fileno(), total_size)
+            downloaded = 0
+            last_print = 0.0
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                if chunk:
+                    f.write(chunk)
+                    downloaded += len(chunk)
+                    # 進捗表示はPROGRESS_INTERVALごとに間引く
+                    now = time.monotonic()
+                    if total_size > 0 and now - last_print >= PROGRESS_INTERVAL:
+                        last_print = now
+                        progress = downloaded / total_size * 100
+                        print(f"\r進捗: {progress:.1f}%", end="", flush=True)
+            # 実際に受け取った長さに合わせる（content-lengthと違った場合に末尾を残さない）
+            f.truncate(downloaded)
+        os.replace(part_path, dest_path)
+    except BaseException:
+        # 失敗・中断時は書きかけのファイルを残さない
+        part_path.unlink(missing_ok=True)
+        raise
     
+    if total_size > 0:
+        print(f"\r進捗: {downloaded / total_size * 100:.1f}%", end="")
     print("\nダウンロード完了")
 
+def _write_member(path, data, mode):
+    """展開したメンバー1つ分をファイルに書き込む（ワーカースレッドで実行）"""
+    with open(path, 'wb') as f:
+        f.write(data)
+    os.chmod(path, mode)
+
+def extract_tar(archive_path, extract_to):
+    """tar.gzを展開（伸長はメインスレッド、ファイルの書き込みはスレッドプールで並行して行う）"""
+    root = Path(extract_to).resolve()
+    links = []  # シンボリックリンク等は、ファイルを書き終えてから作る
+    pending = deque()  # (サイズ, Future)
+    pending_bytes = 0
+    with tarfile.open(archive_path, 'r:gz') as tar_ref, \
+            ThreadPoolExecutor(max_workers=EXTRACT_WORKERS) as executor:
+        for member in tar_ref:
+            dest = (root / member.name).resolve()
+            if dest != root and root not in dest.parents:
+                raise Exception(f"展開先の外を指すメンバー: {member.name}")
+            
+            if member.isdir():
+                dest.mkdir(parents=True, exist_ok=True)
+            elif member.isfile():
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                if member.size > STREAM_MEMBER_SIZE:
+                    with tar_ref.extractfile(member) as src, open(dest, 'wb') as f:
+                        shutil.copyfileobj(src, f, DOWNLOAD_CHUNK_SIZE)
+                    os.chmod(dest, member.mode)
+                else:
+                    data = tar_ref.extractfile(member).read()
+                    # 書き込み待ちがMAX_PENDING_BYTESを超える間は読み込みを待つ（メモリに溜め込まない）
+                    while pending and pending_bytes + len(data) > MAX_PENDING_BYTES:
+                        size, future = pending.popleft()
+                        future.result()
+                        pending_bytes -= size
+                    pending.append((len(data), executor.submit(_write_member, dest, data, member.mode)))
+                    pending_bytes += len(data)
+            else:
+                links.append(member)
+        
+        for _, future in pending:
+            future.result()
+        for member in links:
+            tar_ref.extract(member, extract_to)
+
+def extract_zip(archive_path, extract_to):
+    """zipを展開（メンバーは独立して伸長できるので、スレッドごとにZipFileを開いて並列に展開する）"""
+    with zipfile.ZipFile(archive_path, 'r') as zip_ref:
+        names = zip_ref.namelist()
+    
+    # ディレクトリは先に作っておく（ワーカー同士でmakedirsが競合しないように）
+    for name in names:
+        Path(extract_to, os.path.dirname(name.rstrip('/'))).mkdir(parents=True, exist_ok=True)
+    
+    local = threading.local()
+    opened = []
+    
+    def extract_one(name):
+        zip_ref = getattr(local, 'zip_ref', None)
+        if zip_ref is None:
+            zip_ref = local.zip_ref = zipfile.ZipFile(archive_path, 'r')
+            opened.append(zip_ref)
+        zip_ref.extract(name, extract_to)
+    
+    try:
+        with ThreadPoolExecutor(max_workers=EXTRACT_WORKERS) as executor:
+            list(executor.map(extract_one, names))
+    finally:
+        for zip_ref in opened:
+            zip_ref.close()
+
 def extract_archive(archive_path, extract_to):
     """アーカイブを展開"""
     print(f"展開中: {archive_path}")
     
     if archive_path.suffix == '.zip':
-        with zipfile.ZipFile(archive_path, 'r') as zip_ref:
-            zip_ref.extractall(extract_to)
+        extract_zip(archive_path, extract_to)
     elif archive_path.suffix in ['.gz', '.tar']:
-        with tarfile.open(archive_path, 'r:gz') as tar_ref:
-            tar_ref.extractall(extract_to)
+        extract_tar(archive_path, extract_to)
     else:
         raise Exception(f"サポートされていないアーカイブ形式: {archive_path.suffix}")
     
@@ -6,8 +6,12 @@ Dockerがインストールされている場合の最も簡単な方法
 import subprocess
 import time
 import requests
-import json
 import os
+import sys
+
+# クエリ生成・合成・キャッシュは親ディレクトリのtts_core.pyを共有する
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tts_core import SESSION, engine_version, load_speakers, synth_to_file
 
 def check_docker():
     """Dockerがインストールされているか確認"""
@@ -21,9 +25,9 @@ def start_voicevox_docker():
     """VOICEVOX Dockerコンテナを起動"""
     print("VOICEVOXコンテナを起動中...")
     
-    # 既存のコンテナを停止
-    subprocess.run(['docker', 'stop', 'voicevox-engine'], capture_output=True)
-    subprocess.run(['docker', 'rm', 'voicevox-engine'], capture_output=True)
+    # 既存のコンテナを停止・削除（rm -fなら1回のdocker呼び出しで済む。出力は読まないので捨てる）
+    subprocess.run(['docker', 'rm', '-f', 'voicevox-engine'],
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
     
     # コンテナを起動
     cmd = [
@@ -41,18 +45,27 @@ def start_voicevox_docker():
         print(f"エラー: {result.stderr}")
         return False
     
-    # 起動を待つ
-    print("起動を待っています", end="")
-    for i in range(30):
+    # 起動を待つ（50msから間隔を1.6倍ずつ延ばし、最大1秒間隔で30秒まで待つ）
+    # 経過時間は同じ行を書き換えて表示する（更新は最大10Hz）
+    start = time.monotonic()
+    deadline = start + 30
+    delay = 0.05
+    last_progress = 0.0
+    while time.monotonic() < deadline:
         try:
-            response = requests.get('http://localhost:50021/version', timeout=1)
-            if response.status_code == 200:
+            response = SESSION.get('http://localhost:50021/version', timeout=0.5)
+            if response.ok:
                 print("\n✓ VOICEVOXが起動しました")
                 return True
-        except:
+        except requests.RequestException:
             pass
-        print(".", end="", flush=True)
-        time.sleep(1)
+        now = time.monotonic()
+        if now - last_progress >= 0.1:
+            last_progress = now
+            sys.stdout.write(f"\r起動を待っています: {now - start:.1f}秒")
+            sys.stdout.flush()
+        time.sleep(delay)
+        delay = min(delay * 1.6, 1.0)
     
     print("\nタイムアウト")
     return False
@@ -79,12 +92,10 @@ def test_voicevox_docker():
     print("\nAPIテスト:")
     
     # バージョン確認
-    response = requests.get('http://localhost:50021/version')
-    print(f"バージョン: {response.text}")
+    print(f"バージョン: {engine_version(SESSION)}")
     
-    # 話者一覧
-    response = requests.get('http://localhost:50021/speakers')
-    speakers = response.json()
+    # 話者一覧（同じバージョンのエンジンなら保存済みの一覧を使う）
+    speakers = load_speakers(SESSION)
     print(f"話者数: {len(speakers)}")
     
     # 音声合成テスト
@@ -92,24 +103,8 @@ def test_voicevox_docker():
     text = "こんにちは、私はずんだもんなのだ！"
     speaker_id = 3
     
-    # クエリ生成
-    params = {'text': text, 'speaker': speaker_id}
-    response = requests.post('http://localhost:50021/audio_query', params=params)
-    audio_query = response.json()
-    
-    # 音声合成
-    headers = {'Content-Type': 'application/json'}
-    response = requests.post(
-        'http://localhost:50021/synthesis',
-        params={'speaker': speaker_id},
-        data=json.dumps(audio_query),
-        headers=headers
-    )
-    
-    # 保存
-    filename = 'outputs/voicevox_docker_test.wav'
-    with open(filename, 'wb') as f:
-        f.write(response.content)
+    # クエリ生成→音声合成→保存
+    filename = synth_to_file(SESSION, text, speaker_id, 'outputs/voicevox_docker_test.wav')
     
     print(f"✓ 音声を生成しました: {filename}")
     
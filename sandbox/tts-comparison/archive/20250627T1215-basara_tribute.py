@@ -2,45 +2,26 @@
 """
 マクロス7の熱気バサラをVOICEVOXキャラクターが褒める
 """
-import requests
-import json
-import time
 import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# クエリ生成・合成・キャッシュは親ディレクトリのtts_core.pyを共有する
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tts_core import SESSION, synth_to_file
 
 def generate_voice(text, speaker_id, output_name):
-    """音声を生成して保存"""
+    """音声を生成して保存（結果の表示行を返す）"""
     try:
-        # 音声クエリの生成
-        params = {'text': text, 'speaker': speaker_id}
-        query_response = requests.post(
-            'http://localhost:50021/audio_query',
-            params=params
-        )
-        
-        # 音声の合成
-        synthesis_response = requests.post(
-            'http://localhost:50021/synthesis',
-            params={'speaker': speaker_id},
-            json=query_response.json(),
-            headers={'Content-Type': 'application/json'}
-        )
-        
-        # 保存
-        filename = f'outputs/{output_name}.wav'
-        with open(filename, 'wb') as f:
-            f.write(synthesis_response.content)
-        
-        print(f"✓ {output_name}: {filename}")
-        return True
-        
+        filename = synth_to_file(SESSION, text, speaker_id, f'outputs/{output_name}.wav')
+        return f"✓ {output_name}: {filename}"
     except Exception as e:
-        print(f"✗ {output_name}: エラー - {e}")
-        return False
+        return f"✗ {output_name}: エラー - {e}"
 
 def main():
     # VOICEVOXが起動しているか確認
     try:
-        response = requests.get('http://localhost:50021/version', timeout=1)
+        response = SESSION.get('http://localhost:50021/version', timeout=1)
         print(f"VOICEVOX Engine: {response.text.strip()}")
     except:
         print("エラー: VOICEVOXエンジンが起動していません")
@@ -79,15 +60,16 @@ def main():
         }
     ]
     
-    # 音声を生成
-    for char in characters:
-        print(f"\n{char['name']} (ID: {char['id']})")
-        print(f"「{char['text']}」")
-        
+    # 音声を生成（キャラクターごとに独立しているので並列に投げる）
+    def run_char(char):
         output_name = f"basara_{char['name'].replace('（', '_').replace('）', '')}"
-        generate_voice(char['text'], char['id'], output_name)
-        
-        time.sleep(0.5)  # API負荷軽減のため少し待つ
+        return generate_voice(char['text'], char['id'], output_name)
+    
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        for char, line in zip(characters, executor.map(run_char, characters)):
+            print(f"\n{char['name']} (ID: {char['id']})")
+            print(f"「{char['text']}」")
+            print(line)
     
     print("\n=== 完了！ ===")
     print("生成された音声ファイルは outputs/ ディレクトリにあります")
@@ -2,42 +2,37 @@
 """
 VOICEVOXのアクセント・イントネーション調整のテスト
 """
-import requests
-import json
-import time
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# クエリ生成・合成・キャッシュは親ディレクトリのtts_core.pyを共有する
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tts_core import (SESSION, apply_mora_pitches, get_audio_query, synth_to_file,
+                      synthesize_to_file)
 
 def generate_with_accent_phrase(text, speaker_id, modifications=None):
-    """アクセント句を調整して音声を生成"""
+    """アクセント句を調整して音声を生成（調整後のクエリと表示行を返す）"""
     
-    # 音声クエリの生成
-    params = {'text': text, 'speaker': speaker_id}
-    query_response = requests.post(
-        'http://localhost:50021/audio_query',
-        params=params
-    )
-    audio_query = query_response.json()
+    # 音声クエリの生成（同じテキストの2回目以降は問い合わせずにコピーを使う）
+    audio_query = get_audio_query(SESSION, text, speaker_id)
     
     # アクセント句の確認と調整
-    print(f"\n元のアクセント句:")
+    lines = [f"\n元のアクセント句:"]
     for i, phrase in enumerate(audio_query['accent_phrases']):
-        print(f"  {i}: {phrase['pause_mora']}") if 'pause_mora' in phrase else None
+        if 'pause_mora' in phrase:
+            lines.append(f"  {i}: {phrase['pause_mora']}")
         for j, mora in enumerate(phrase['moras']):
             text = mora['text']
             pitch = mora['pitch']
-            print(f"    [{j}] {text}: pitch={pitch}")
+            lines.append(f"    [{j}] {text}: pitch={pitch}")
     
     # アクセントの調整
     if modifications:
-        for mod in modifications:
-            phrase_idx = mod['phrase']
-            mora_idx = mod['mora']
-            new_pitch = mod['pitch']
-            if phrase_idx < len(audio_query['accent_phrases']):
-                if mora_idx < len(audio_query['accent_phrases'][phrase_idx]['moras']):
-                    audio_query['accent_phrases'][phrase_idx]['moras'][mora_idx]['pitch'] = new_pitch
-                    print(f"\n✓ 調整: 句{phrase_idx} モーラ{mora_idx} → pitch={new_pitch}")
+        for mod in apply_mora_pitches(audio_query, modifications):
+            lines.append(f"\n✓ 調整: 句{mod['phrase']} モーラ{mod['mora']} → pitch={mod['pitch']}")
     
-    return audio_query
+    return audio_query, lines
 
 def test_basara_accent():
     """バサラさんのアクセントパターンをテスト"""
@@ -90,34 +85,38 @@ def test_basara_accent():
         }
     ]
     
-    # 各パターンで音声を生成
-    for i, test in enumerate(test_cases):
-        print(f"\n{'='*50}")
-        print(f"テスト{i+1}: {test['name']}")
-        print(f"テキスト: {test['text']}")
+    def run_case(i_test):
+        """1パターン分の調整・合成・保存（ワーカースレッドで実行し、表示行を返す）"""
+        i, test = i_test
+        lines = [
+            f"\n{'='*50}",
+            f"テスト{i+1}: {test['name']}",
+            f"テキスト: {test['text']}",
+        ]
         
         # アクセント句の調整
-        audio_query = generate_with_accent_phrase(
+        audio_query, query_lines = generate_with_accent_phrase(
             test['text'], 
             test['speaker'], 
             test['modifications']
         )
+        lines.extend(query_lines)
         
-        # 音声の合成
-        synthesis_response = requests.post(
-            'http://localhost:50021/synthesis',
-            params={'speaker': test['speaker']},
-            json=audio_query,
-            headers={'Content-Type': 'application/json'}
-        )
-        
-        # 保存
+        # 音声の合成・保存
         filename = f"outputs/accent_test_{i}_{test['name']}.wav"
-        with open(filename, 'wb') as f:
-            f.write(synthesis_response.content)
+        synthesize_to_file(SESSION, audio_query, test['speaker'], filename)
         
-        print(f"\n✓ 保存: {filename}")
-        time.sleep(0.5)
+        lines.append(f"\n✓ 保存: {filename}")
+        return lines
+    
+    # 共通の音声クエリは並列実行の前に取得しておく
+    for test in test_cases:
+        get_audio_query(SESSION, test['text'], test['speaker'])
+    
+    # 各パターンで音声を生成（パターン間に依存はないので並列に投げ、表示は順に行う）
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        for lines in executor.map(run_case, enumerate(test_cases)):
+            print("\n".join(lines))
     
     # その他の調整方法の説明
     print("\n" + "="*50)
@@ -132,23 +131,12 @@ def test_basara_accent():
     # 速度とピッチを調整した例
     print("\n追加テスト: パラメータ調整")
     
-    params = {'text': 'バサラさんの歌は最高なのだ！', 'speaker': 3}
-    audio_query = requests.post('http://localhost:50021/audio_query', params=params).json()
-    
     # パラメータを調整
-    audio_query['speedScale'] = 0.9  # 少しゆっくり
-    audio_query['pitchScale'] = 1.05  # 少し高め
-    audio_query['intonationScale'] = 1.3  # 抑揚を強く
-    
-    synthesis_response = requests.post(
-        'http://localhost:50021/synthesis',
-        params={'speaker': 3},
-        json=audio_query,
-        headers={'Content-Type': 'application/json'}
-    )
-    
-    with open("outputs/accent_test_parameter.wav", 'wb') as f:
-        f.write(synthesis_response.content)
+    synth_to_file(SESSION, 'バサラさんの歌は最高なのだ！', 3, "outputs/accent_test_parameter.wav", overrides={
+        'speedScale': 0.9,  # 少しゆっくり
+        'pitchScale': 1.05,  # 少し高め
+        'intonationScale': 1.3,  # 抑揚を強く
+    })
     
     print("✓ パラメータ調整版: outputs/accent_test_parameter.wav")
     print("  - 速度: 0.9倍")
@@ -2,73 +2,59 @@
 """
 「バサラさん」のアクセントパターン比較
 """
-import requests
-import json
-import time
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# クエリ生成・合成・キャッシュは親ディレクトリのtts_core.pyを共有する
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tts_core import SESSION, apply_mora_pitches, get_audio_query, synthesize_to_file
 
 def generate_basara_accent(pattern_name, modifications=None):
-    """バサラさんのアクセントパターンを生成"""
+    """バサラさんのアクセントパターンを生成
+    
+    並列に呼ばれるので表示はせず、(保存先, 表示行) を返す
+    """
     
     text = "バサラさん"
     speaker_id = 3  # ずんだもん
     
-    # 音声クエリの生成
-    params = {'text': text, 'speaker': speaker_id}
-    query_response = requests.post(
-        'http://localhost:50021/audio_query',
-        params=params
-    )
-    audio_query = query_response.json()
+    # 音声クエリの生成（全パターン同じテキストなので、問い合わせは初回だけ）
+    audio_query = get_audio_query(SESSION, text, speaker_id)
     
     # アクセント句の確認
-    print(f"\n{pattern_name}:")
-    print(f"テキスト: {text}")
+    lines = [f"\n{pattern_name}:", f"テキスト: {text}"]
     for i, phrase in enumerate(audio_query['accent_phrases']):
         for j, mora in enumerate(phrase['moras']):
             text_mora = mora['text']
             pitch = mora['pitch']
-            print(f"  [{j}] {text_mora}: pitch={pitch:.2f}")
+            lines.append(f"  [{j}] {text_mora}: pitch={pitch:.2f}")
     
     # アクセントの調整
     if modifications:
-        for mod in modifications:
-            phrase_idx = mod.get('phrase', 0)
-            mora_idx = mod['mora']
-            new_pitch = mod['pitch']
-            if phrase_idx < len(audio_query['accent_phrases']):
-                if mora_idx < len(audio_query['accent_phrases'][phrase_idx]['moras']):
-                    audio_query['accent_phrases'][phrase_idx]['moras'][mora_idx]['pitch'] = new_pitch
+        apply_mora_pitches(audio_query, modifications)
         
-        print("調整後:")
+        lines.append("調整後:")
         for i, phrase in enumerate(audio_query['accent_phrases']):
             for j, mora in enumerate(phrase['moras']):
                 text_mora = mora['text']
                 pitch = mora['pitch']
-                print(f"  [{j}] {text_mora}: pitch={pitch:.2f}")
+                lines.append(f"  [{j}] {text_mora}: pitch={pitch:.2f}")
     
-    # 音声の合成
-    synthesis_response = requests.post(
-        'http://localhost:50021/synthesis',
-        params={'speaker': speaker_id},
-        json=audio_query,
-        headers={'Content-Type': 'application/json'}
-    )
-    
-    # 保存
+    # 音声の合成・保存
     filename = f"outputs/basara_{pattern_name}.wav"
-    with open(filename, 'wb') as f:
-        f.write(synthesis_response.content)
+    synthesize_to_file(SESSION, audio_query, speaker_id, filename)
     
-    print(f"✓ 保存: {filename}")
+    lines.append(f"✓ 保存: {filename}")
     
-    return filename
+    return filename, lines
 
 def main():
     print("=== 「バサラさん」アクセントパターン比較 ===")
     
     # VOICEVOXエンジンの確認
     try:
-        response = requests.get('http://localhost:50021/version', timeout=1)
+        response = SESSION.get('http://localhost:50021/version', timeout=1)
         print(f"\nVOICEVOX Engine: {response.text.strip()}")
     except:
         print("\nエラー: VOICEVOXエンジンが起動していません")
@@ -132,15 +118,18 @@ def main():
         }
     ]
     
-    # 各パターンを生成
+    # 共通の音声クエリは並列実行の前に1回だけ取得しておく
+    get_audio_query(SESSION, "バサラさん", 3)
+    
+    # 各パターンを生成（独立したリクエストなので並列に投げ、表示はパターン順に行う）
     generated_files = []
-    for pattern in patterns:
-        filename = generate_basara_accent(
-            pattern['name'],
-            pattern['modifications']
-        )
-        generated_files.append(filename)
-        time.sleep(0.3)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = executor.map(
+            lambda pattern: generate_basara_accent(pattern['name'], pattern['modifications']),
+            patterns)
+        for filename, lines in results:
+            print("\n".join(lines))
+            generated_files.append(filename)
     
     print("\n" + "="*50)
     print("生成完了！連続再生するには:")
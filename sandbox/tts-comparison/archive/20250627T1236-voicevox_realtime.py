@@ -9,11 +9,24 @@ import pyaudio
 import threading
 import queue
 import time
-import io
-import wave
+import itertools
+import struct
 import subprocess
 import numpy as np
 
+# /synthesisのレスポンスを読む単位（小さくして最初の音声をすぐ再生に回す）
+STREAM_CHUNK_SIZE = 4096
+
+def pipe_to_afplay(response):
+    """レスポンスを受信しながらafplayの標準入力に流し込み、再生終了まで待つ"""
+    process = subprocess.Popen(['afplay', '-'], stdin=subprocess.PIPE)
+    try:
+        for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+            process.stdin.write(chunk)
+    finally:
+        process.stdin.close()
+        process.wait()
+
 class VoiceVoxRealtimePlayer:
     def __init__(self, speaker_id=3, host='localhost', port=50021):
         self.base_url = f'http://{host}:{port}'
@@ -61,49 +74,90 @@ class VoiceVoxRealtimePlayer:
         
         query_time = time.time() - start_time
         
-        # 音声合成
+        # 音声合成（WAV全体を待たず、受信したところから再生する）
         synthesis_start = time.time()
-        synthesis_response = requests.post(
+        with requests.post(
             f'{self.base_url}/synthesis',
             params={'speaker': self.speaker_id},
             json=audio_query,
             headers={'Content-Type': 'application/json'},
             stream=True  # ストリーミングレスポンス
-        )
-        
-        # WAVデータを直接再生
-        audio_data = synthesis_response.content
-        synthesis_time = time.time() - synthesis_start
-        
-        # PyAudioで直接再生
-        self._play_audio_direct(audio_data)
+        ) as synthesis_response:
+            synthesis_response.raise_for_status()
+            
+            # PyAudioで直接再生
+            first_audio = self._play_audio_direct(
+                synthesis_response.iter_content(chunk_size=STREAM_CHUNK_SIZE))
         
+        first_audio_time = first_audio - synthesis_start
         total_time = time.time() - start_time
-        print(f"レイテンシ: クエリ={query_time:.3f}秒, 合成={synthesis_time:.3f}秒, 合計={total_time:.3f}秒")
+        print(f"レイテンシ: クエリ={query_time:.3f}秒, 初回音声={first_audio_time:.3f}秒, 合計={total_time:.3f}秒")
     
-    def _play_audio_direct(self, audio_data):
-        """WAVデータを直接再生（ファイル保存なし）"""
-        # WAVデータをメモリ上で読み込み
-        wav_file = wave.open(io.BytesIO(audio_data), 'rb')
+    def _play_audio_direct(self, chunks):
+        """受信中のWAVデータを直接再生（ファイル保存なし）
+        
+        chunks: WAVのバイト列を先頭から順に返すイテレータ。
+        ヘッダを読んだ時点でストリームを開き、以降のデータは届いた分から書き込む。
+        最初の音声を書き込んだ時刻（time.time()）を返す
+        """
+        buf = bytearray()
+        
+        def fill(n):
+            """bufがnバイトになるまで受信する"""
+            while len(buf) < n:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    raise ValueError("WAVデータが途中で終わりました")
+                buf.extend(chunk)
+        
+        # RIFFヘッダを読み、dataチャンクの手前まで進める
+        fill(12)
+        if buf[:4] != b'RIFF' or buf[8:12] != b'WAVE':
+            raise ValueError("WAV形式ではありません")
+        pos = 12
+        channels = rate = sampwidth = None
+        while True:
+            fill(pos + 8)
+            chunk_id = bytes(buf[pos:pos + 4])
+            size = int.from_bytes(buf[pos + 4:pos + 8], 'little')
+            pos += 8
+            if chunk_id == b'data':
+                break
+            fill(pos + size)
+            if chunk_id == b'fmt ':
+                channels, rate = struct.unpack_from('<HI', buf, pos + 2)
+                sampwidth = struct.unpack_from('<H', buf, pos + 14)[0] // 8
+            pos += size + (size & 1)  # チャンクは偶数バイト境界に揃っている
+        if channels is None:
+            raise ValueError("fmtチャンクがありません")
         
         # ストリームを開く
         stream = self.p.open(
-            format=self.p.get_format_from_width(wav_file.getsampwidth()),
-            channels=wav_file.getnchannels(),
-            rate=wav_file.getframerate(),
+            format=self.p.get_format_from_width(sampwidth),
+            channels=channels,
+            rate=rate,
             output=True
         )
         
-        # 音声データを再生
-        data = wav_file.readframes(1024)
-        while data:
-            stream.write(data)
-            data = wav_file.readframes(1024)
+        # 音声データを再生（フレームの途中で切れた分は次のチャンクと合わせて書く）
+        frame_size = channels * sampwidth
+        first_audio = None
+        tail = b''
+        try:
+            for chunk in itertools.chain((bytes(buf[pos:]),), chunks):
+                data = tail + chunk
+                usable = len(data) - len(data) % frame_size
+                if usable:
+                    if first_audio is None:
+                        first_audio = time.time()
+                    stream.write(data[:usable])
+                tail = data[usable:]
+        finally:
+            # クリーンアップ
+            stream.stop_stream()
+            stream.close()
         
-        # クリーンアップ
-        stream.stop_stream()
-        stream.close()
-        wav_file.close()
+        return first_audio if first_audio is not None else time.time()
     
     def speak_macos_direct(self, text):
         """macOS sayコマンドを使った超低レイテンシ版（比較用）"""
@@ -153,20 +207,18 @@ class VoiceVoxOptimized:
         audio_query['pauseLength'] = 0.1
         
         # 音声合成
-        synthesis_response = self.session.post(
+        with self.session.post(
             f'{self.base_url}/synthesis',
             params={'speaker': self.speaker_id},
             json=audio_query,
             headers={'Content-Type': 'application/json'},
-            timeout=2.0
-        )
-        
-        # macOSの場合、afplayで直接再生（パイプ使用）
-        process = subprocess.Popen(
-            ['afplay', '-'],
-            stdin=subprocess.PIPE
-        )
-        process.communicate(input=synthesis_response.content)
+            timeout=2.0,
+            stream=True
+        ) as synthesis_response:
+            synthesis_response.raise_for_status()
+            
+            # macOSの場合、afplayで直接再生（受信しながらパイプに流す）
+            pipe_to_afplay(synthesis_response)
 
 def test_realtime():
     """リアルタイム性能のテスト"""
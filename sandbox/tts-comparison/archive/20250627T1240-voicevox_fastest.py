@@ -9,9 +9,11 @@ import json
 import subprocess
 import threading
 import time
-from concurrent.futures import ThreadPoolExecutor
 import os
 
+# /synthesisのレスポンスを読む単位（小さくして最初の音声をすぐ再生に回す）
+STREAM_CHUNK_SIZE = 4096
+
 class VoiceVoxFastest:
     def __init__(self, speaker_id=3, host='localhost', port=50021):
         self.base_url = f'http://{host}:{port}'
@@ -36,25 +38,16 @@ class VoiceVoxFastest:
         # 短いテキストはキャッシュを利用
         cache_key = f"{self.speaker_id}:{text[:10]}"
         
-        # 並列処理でクエリ生成と準備
-        with ThreadPoolExecutor(max_workers=2) as executor:
-            # クエリ生成
-            future_query = executor.submit(self._generate_query, text)
-            
-            # 音声クエリを取得
-            audio_query = future_query.result()
-            
-            # 音声合成
-            future_synth = executor.submit(self._synthesize, audio_query)
-            audio_data = future_synth.result()
+        # 音声クエリを取得（合成はクエリに依存するので順に行う）
+        audio_query = self._generate_query(text)
         
         # 最速再生方法を選択
         if sys.platform == 'darwin':
-            # macOSの場合、afplayをパイプで使用（最速）
-            self._play_with_afplay_pipe(audio_data)
+            # macOSの場合、合成結果を受信しながらafplayにパイプで流す（最速）
+            self._play_with_afplay_pipe(audio_query)
         else:
             # その他のOSではファイルに保存して再生
-            self._play_with_file(audio_data)
+            self._play_with_file(self._synthesize(audio_query))
         
         total_time = time.time() - start_time
         return total_time
@@ -93,15 +86,32 @@ class VoiceVoxFastest:
         )
         return response.content
     
-    def _play_with_afplay_pipe(self, audio_data):
-        """afplayにパイプで直接音声データを送る（最速）"""
-        process = subprocess.Popen(
-            ['afplay', '-'],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL
-        )
-        process.communicate(input=audio_data)
+    def _play_with_afplay_pipe(self, audio_query):
+        """音声を合成し、受信したチャンクから順にafplayへパイプで送る（最速）
+        
+        WAV全体の受信を待たないので、再生開始は最初のチャンクが届いた時点になる
+        """
+        with self.session.post(
+            f'{self.base_url}/synthesis',
+            params={'speaker': self.speaker_id},
+            json=audio_query,
+            headers={'Content-Type': 'application/json'},
+            timeout=1.0,
+            stream=True
+        ) as response:
+            response.raise_for_status()
+            process = subprocess.Popen(
+                ['afplay', '-'],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL
+            )
+            try:
+                for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                    process.stdin.write(chunk)
+            finally:
+                process.stdin.close()
+                process.wait()
     
     def _play_with_file(self, audio_data):
         """一時ファイル経由で再生"""
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+VOICEVOXの「クエリ生成→（調整）→合成→保存」の共通部分
+接続の使い回し・クエリと合成結果のキャッシュ・ファイルへのストリーミング保存をここにまとめ、
+各スクリプトはsynth_to_file()か個別の関数を呼ぶ
+"""
+import functools
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+
+BASE_URL = 'http://localhost:50021'
+
+# VOICEVOXエンジンへの接続を使い回す（リクエスト毎のTCP接続確立を避ける）
+SESSION = requests.Session()
+SESSION.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=0))
+
+try:
+    import orjson
+
+    def dumps_query(audio_query):
+        """クエリをキー順を揃えたJSONのバイト列にする"""
+        return orjson.dumps(audio_query, option=orjson.OPT_SORT_KEYS)
+
+    loads = orjson.loads
+except ImportError:  # orjson未インストール時は標準のjsonで同じ形にする
+    def dumps_query(audio_query):
+        """クエリをキー順を揃えたJSONのバイト列にする"""
+        return json.dumps(audio_query, sort_keys=True, ensure_ascii=False,
+                          separators=(',', ':')).encode()
+
+    loads = json.loads
+
+# /synthesisの結果などを保存するディレクトリ（同じクエリ・話者の再合成を省く）
+CACHE_DIR = Path('.cache/voicevox')
+
+# /speakersの結果の有効期間（秒）
+SPEAKERS_TTL = 600
+
+@functools.lru_cache(maxsize=64)
+def fetch_audio_query_json(session, text, speaker_id, base_url=BASE_URL):
+    """/audio_queryの結果をJSONのバイト列のまま覚えておく（同じテキスト・話者は1回だけ問い合わせる）"""
+    response = session.post(
+        f'{base_url}/audio_query',
+        params={'text': text, 'speaker': speaker_id}
+    )
+    response.raise_for_status()
+    return response.content
+
+def get_audio_query(session, text, speaker_id, base_url=BASE_URL):
+    """音声クエリを取得（呼び出し毎に新しいdictを返すので、そのまま書き換えてよい）"""
+    return loads(fetch_audio_query_json(session, text, speaker_id, base_url))
+
+@functools.lru_cache(maxsize=8)
+def engine_version(session, base_url=BASE_URL):
+    """エンジンのバージョン文字列（接続先ごとに1回だけ問い合わせる）"""
+    response = session.get(f'{base_url}/version')
+    response.raise_for_status()
+    return response.text
+
+def apply_mora_pitches(audio_query, mods):
+    """モーラのピッチを書き換え、実際に適用した変更だけを返す
+
+    mods: {'phrase': 句番号（省略時は0）, 'mora': モーラ番号, 'pitch': 値} のリスト。
+    範囲外を指すものは無視する
+    """
+    phrases = audio_query['accent_phrases']
+    applied = []
+    for mod in mods:
+        phrase_idx = mod.get('phrase', 0)
+        mora_idx = mod['mora']
+        if phrase_idx < len(phrases):
+            moras = phrases[phrase_idx]['moras']
+            if mora_idx < len(moras):
+                moras[mora_idx]['pitch'] = mod['pitch']
+                applied.append(mod)
+    return applied
+
+def cached_synthesis_path(session, audio_query, speaker_id, base_url=BASE_URL):
+    """/synthesisの結果（WAV）をディスクにキャッシュし、そのパスを返す
+
+    キーはキー順を揃えたクエリのJSON（送信するボディそのもの）と話者IDのハッシュなので、
+    ピッチを1つ変えただけのクエリは別のキー、同じクエリの再実行はヒットになる。
+    接続先とエンジンのバージョンもキーに含め、エンジンの更新や
+    Docker版/アプリ版の切り替えで古い音声を返さないようにする
+    """
+    payload = dumps_query(audio_query)
+    digest = hashlib.blake2b(payload)
+    digest.update(f'\0{speaker_id}\0{base_url}\0{engine_version(session, base_url)}'.encode())
+    key = digest.hexdigest()
+    path = CACHE_DIR / key[:2] / key
+    if path.exists():
+        return path
+
+    # 並列に同じキーを書いても壊れないよう、一時ファイルに書いてから置き換える
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f'.{os.getpid()}-{threading.get_ident()}.tmp')
+    try:
+        with session.post(
+            f'{base_url}/synthesis',
+            params={'speaker': speaker_id},
+            data=payload,
+            headers={'Content-Type': 'application/json'},
+            stream=True
+        ) as response:
+            response.raise_for_status()  # エラー応答はキャッシュしない
+            # WAV全体をbytesにせず、受信したチャンクをそのままファイルに書く
+            response.raw.decode_content = True
+            with open(tmp, 'wb') as f:
+                shutil.copyfileobj(response.raw, f, 64 * 1024)
+        tmp.replace(path)
+    except BaseException:
+        # 受信途中で失敗・中断したら書きかけの一時ファイルを消す
+        tmp.unlink(missing_ok=True)
+        raise
+    return path
+
+def cached_synthesize(session, audio_query, speaker_id, base_url=BASE_URL):
+    """/synthesisの結果（WAVのバイト列）をキャッシュ経由で返す"""
+    return cached_synthesis_path(session, audio_query, speaker_id, base_url).read_bytes()
+
+def synthesize_to_file(session, audio_query, speaker_id, filename, base_url=BASE_URL):
+    """合成結果をfilenameに保存する（キャッシュからのファイルコピーでメモリに載せない）"""
+    shutil.copyfile(cached_synthesis_path(session, audio_query, speaker_id, base_url), filename)
+    return filename
+
+def synth_to_file(session, text, speaker_id, out_path, overrides=None,
+                  mora_pitch_mods=None, base_url=BASE_URL):
+    """テキストを合成してout_pathに保存する
+
+    overrides: クエリに上書きするパラメータ（speedScaleなど）
+    mora_pitch_mods: apply_mora_pitchesに渡すピッチの変更
+    """
+    audio_query = get_audio_query(session, text, speaker_id, base_url)
+    if overrides:
+        audio_query.update(overrides)
+    if mora_pitch_mods:
+        apply_mora_pitches(audio_query, mora_pitch_mods)
+    return synthesize_to_file(session, audio_query, speaker_id, out_path, base_url)
+
+def load_speakers(session, base_url=BASE_URL):
+    """話者一覧を取得（SPEAKERS_TTL以内に保存したものがあれば問い合わせない）
+
+    接続先とエンジンのバージョンごとに別のファイルに保存し、
+    Docker版/アプリ版の切り替えやエンジンの更新で別のエンジンの一覧（スタイルID）を返さないようにする
+    """
+    key = hashlib.blake2b(f'{base_url}\0{engine_version(session, base_url)}'.encode(),
+                          digest_size=8).hexdigest()
+    path = CACHE_DIR / f'speakers-{key}.json'
+    try:
+        if time.time() - path.stat().st_mtime < SPEAKERS_TTL:
+            return loads(path.read_bytes())
+    except FileNotFoundError:
+        pass
+
+    response = session.get(f'{base_url}/speakers')
+    response.raise_for_status()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+    tmp.write_bytes(response.content)
+    tmp.replace(path)
+    return loads(response.content)